@@ -1,7 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash
 from functools import wraps
 import os
 import math
@@ -13,6 +12,7 @@ from models import (User, Driver, Vehicle, Branch, Duty, DutyScheme,
                    DriverStatus, VehicleStatus, DutyStatus, AssignmentStatus, ResignationRequest, ResignationStatus, UserRole, UserStatus, AdvancePaymentRequest, ManualEarningsCalculation)
 from forms import DriverForm, VehicleForm, DutySchemeForm, VehicleAssignmentForm, ScheduledAssignmentForm, QuickAssignmentForm, AssignmentTemplateForm, ManualEarningsCalculationForm
 from utils_main import allowed_file, calculate_earnings, process_file_upload, process_camera_capture
+from utils.security import hash_password
 import json
 from timezone_utils import get_ist_time_naive
 
@@ -36,7 +36,7 @@ except ImportError:
         
     def create_recurring_assignments(base_assignment_data, pattern, until_date, assigned_by_user_id):
         return {'success': False, 'created_count': 0, 'errors': ['Function not available']}
-from auth import log_audit
+from auth import log_audit, get_branch_choices
 from recommendation_engine import recommendation_engine
 
 admin_bp = Blueprint('admin', __name__)
@@ -1018,8 +1018,7 @@ def add_driver():
     form = DriverForm()
     
     # Populate branch choices
-    branches = Branch.query.filter_by(is_active=True).all()
-    form.branch_id.choices = [(b.id, b.name) for b in branches]
+    form.branch_id.choices = get_branch_choices()
     
     if form.validate_on_submit():
         try:
@@ -1027,7 +1026,7 @@ def add_driver():
             user = User()
             user.username = (form.full_name.data or '').lower().replace(' ', '_')
             user.email = f"{user.username}@plstravels.com"  # Generate email if not provided
-            user.password_hash = generate_password_hash('driver123')  # Default password
+            user.password_hash = hash_password('driver123')  # Default password
             user.role = UserRole.DRIVER
             user.status = UserStatus.ACTIVE
             
@@ -1086,8 +1085,7 @@ def edit_driver(driver_id):
     form = DriverForm(obj=driver)
     
     # Populate branch choices
-    branches = Branch.query.filter_by(is_active=True).all()
-    form.branch_id.choices = [(b.id, b.name) for b in branches]
+    form.branch_id.choices = get_branch_choices()
     
     if form.validate_on_submit():
         try:
@@ -12,7 +12,16 @@ import time
 import hashlib
 from functools import wraps
 from collections import defaultdict
+from dataclasses import dataclass, field
 from threading import Lock
+from typing import Any, List, Optional, Union
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    msgspec = None
+    MSGSPEC_AVAILABLE = False
 
 from app import db
 from models import Driver, Duty, TrackingSession, DriverLocation, DutyStatus
@@ -23,6 +32,120 @@ api_tracking_bp = Blueprint('api_tracking', __name__, url_prefix='/api/v1/tracki
 
 logger = logging.getLogger(__name__)
 
+# Batch uploads are decoded in two steps: the envelope keeps each point as
+# raw JSON, and every point is then decoded on its own, so a bad point is
+# reported by itself instead of failing the whole batch. Decoding is lax
+# (strict=False): numeric strings such as "12.5" or "123" are converted, as
+# the original dict-based handler accepted them.
+if MSGSPEC_AVAILABLE:
+    class LocationPoint(msgspec.Struct):
+        """Single GPS point"""
+        latitude: float
+        longitude: float
+        captured_at: str
+        client_event_id: Union[str, int, None] = None
+        accuracy: Optional[float] = None
+        altitude: Optional[float] = None
+        speed: Optional[float] = None
+        bearing: Optional[float] = None
+        battery_level: Optional[int] = None
+        network_type: Optional[str] = None
+        signal_strength: Optional[int] = None
+        is_mocked: Optional[bool] = False
+
+    class LocationBatch(msgspec.Struct):
+        """Batch upload envelope"""
+        duty_id: Optional[int] = None
+        session_id: Optional[str] = None
+        locations: List[msgspec.Raw] = []
+        device_info: Any = {}
+        app_version: Optional[str] = 'unknown'
+
+    _location_batch_decoder = msgspec.json.Decoder(LocationBatch, strict=False)
+    _location_point_decoder = msgspec.json.Decoder(LocationPoint, strict=False)
+else:
+    @dataclass
+    class LocationPoint:
+        """Single GPS point (fallback when msgspec is not installed)"""
+        latitude: float
+        longitude: float
+        captured_at: str
+        client_event_id: Union[str, int, None] = None
+        accuracy: Optional[float] = None
+        altitude: Optional[float] = None
+        speed: Optional[float] = None
+        bearing: Optional[float] = None
+        battery_level: Optional[int] = None
+        network_type: Optional[str] = None
+        signal_strength: Optional[int] = None
+        is_mocked: Optional[bool] = False
+
+    @dataclass
+    class LocationBatch:
+        """Batch upload envelope (fallback when msgspec is not installed)"""
+        duty_id: Any = None
+        session_id: Optional[str] = None
+        locations: List[Any] = field(default_factory=list)
+        device_info: Any = field(default_factory=dict)
+        app_version: Optional[str] = 'unknown'
+
+
+def decode_location_batch(raw: bytes) -> LocationBatch:
+    """
+    Decode the batch envelope; the points themselves are decoded later by
+    parse_location_point. Raises ValueError if the body is not a valid
+    batch payload.
+    """
+    if MSGSPEC_AVAILABLE:
+        try:
+            return _location_batch_decoder.decode(raw)
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise ValueError(str(e)) from e
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(str(e)) from e
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    if not isinstance(data.get('locations', []), list):
+        raise ValueError("Invalid type for locations")
+    return LocationBatch(**{name: data[name] for name in LocationBatch.__dataclass_fields__ if name in data})
+
+
+def _optional_number(value, cast):
+    return None if value is None else cast(value)
+
+
+def parse_location_point(data) -> LocationPoint:
+    """
+    Decode one point of a batch. Raises ValueError/TypeError for this
+    point only.
+    """
+    if MSGSPEC_AVAILABLE:
+        try:
+            return _location_point_decoder.decode(data)
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise ValueError(str(e)) from e
+
+    if not isinstance(data, dict) or not all(key in data for key in ('latitude', 'longitude', 'captured_at')):
+        raise ValueError("Missing required fields in location data")
+    network_type = data.get('network_type')
+    return LocationPoint(
+        latitude=float(data['latitude']),
+        longitude=float(data['longitude']),
+        captured_at=data['captured_at'],
+        client_event_id=data.get('client_event_id'),
+        accuracy=_optional_number(data.get('accuracy'), float),
+        altitude=_optional_number(data.get('altitude'), float),
+        speed=_optional_number(data.get('speed'), float),
+        bearing=_optional_number(data.get('bearing'), float),
+        battery_level=_optional_number(data.get('battery_level'), lambda v: int(float(v))),
+        network_type=None if network_type is None else str(network_type),
+        signal_strength=_optional_number(data.get('signal_strength'), lambda v: int(float(v))),
+        is_mocked=data.get('is_mocked', False),
+    )
+
 # Rate limiting and deduplication system
 class TrackingRateLimiter:
     """Production-grade rate limiter for location tracking API"""
@@ -135,6 +258,10 @@ class TrackingRateLimiter:
 # Global rate limiter instance
 tracking_rate_limiter = TrackingRateLimiter()
 
+# Batch upload limits - enforced before the body is parsed
+MAX_BATCH_SIZE = 500  # locations per batch
+MAX_BATCH_BYTES = 512 * 1024  # request body size
+
 def mobile_auth_required(f):
     """Custom authentication decorator for mobile API endpoints"""
     @wraps(f)
@@ -302,8 +429,26 @@ def submit_location_batch():
     }
     """
     try:
-        data = request.get_json()
-        if not data:
+        # Reject oversized bodies before reading/parsing them
+        if request.content_length is not None and request.content_length > MAX_BATCH_BYTES:
+            return jsonify({
+                'success': False,
+                'error': f'Payload too large. Maximum {MAX_BATCH_BYTES} bytes allowed',
+                'code': 'PAYLOAD_TOO_LARGE'
+            }), 413
+        
+        # Bounded read also covers chunked uploads without Content-Length
+        raw = request.stream.read(MAX_BATCH_BYTES + 1)
+        if len(raw) > MAX_BATCH_BYTES:
+            return jsonify({
+                'success': False,
+                'error': f'Payload too large. Maximum {MAX_BATCH_BYTES} bytes allowed',
+                'code': 'PAYLOAD_TOO_LARGE'
+            }), 413
+        
+        try:
+            batch = decode_location_batch(raw)
+        except ValueError:
             return jsonify({
                 'success': False,
                 'error': 'Invalid JSON payload',
@@ -312,8 +457,9 @@ def submit_location_batch():
         
         from flask import g
         driver = g.current_driver
-        duty_id = data.get('duty_id')
-        locations = data.get('locations', [])
+        now_ist = get_ist_time_naive()
+        duty_id = batch.duty_id
+        locations = batch.locations
         
         # Get client IP for rate limiting (secure with ProxyFix)
         # ProxyFix ensures request.remote_addr is the real client IP
@@ -342,7 +488,6 @@ def submit_location_batch():
             }), 400
         
         # Enforce maximum batch size for security and performance
-        MAX_BATCH_SIZE = 500
         if len(locations) > MAX_BATCH_SIZE:
             return jsonify({
                 'success': False,
@@ -384,8 +529,8 @@ def submit_location_batch():
             session = TrackingSession(
                 duty_id=duty_id,
                 driver_id=driver.id,
-                device_info=json.dumps(data.get('device_info', {})),
-                app_version=data.get('app_version', 'unknown')
+                device_info=json.dumps(batch.device_info),
+                app_version=batch.app_version
             )
             db.session.add(session)
             db.session.flush()  # Get the session ID
@@ -395,24 +540,28 @@ def submit_location_batch():
         error_count = 0
         errors = []
         
-        for location_data in locations:
+        # First pass: per-point validation, deduplication and parsing
+        candidates = []
+        for point_data in locations:
             try:
-                # Validate required fields
-                if not all(key in location_data for key in ['latitude', 'longitude', 'captured_at']):
+                try:
+                    point = parse_location_point(point_data)
+                except (ValueError, TypeError) as e:
                     error_count += 1
-                    errors.append(f"Missing required fields in location data")
+                    errors.append(f"Invalid location data: {str(e)}")
                     continue
                 
                 # Privacy and accuracy validation
-                is_valid, validation_reason = LocationPrivacyValidator.validate_location_accuracy(location_data)
+                is_valid, validation_reason = LocationPrivacyValidator.validate_location_point(point)
                 if not is_valid:
                     error_count += 1
                     errors.append(f"Location validation failed: {validation_reason}")
                     continue
                 
                 # Check for duplicates using client_event_id with fast cache lookup
-                client_event_id = location_data.get('client_event_id')
+                client_event_id = point.client_event_id
                 if client_event_id:
+                    client_event_id = str(client_event_id)
                     # First check our fast in-memory cache (scoped by driver)
                     if tracking_rate_limiter.is_duplicate_event(driver.id, client_event_id):
                         duplicate_count += 1
@@ -431,45 +580,58 @@ def submit_location_batch():
                 # Parse captured_at timestamp
                 try:
                     captured_at = datetime.fromisoformat(
-                        location_data['captured_at'].replace('Z', '+00:00')
+                        point.captured_at.replace('Z', '+00:00')
                     )
-                except (ValueError, TypeError):
+                except (ValueError, TypeError, AttributeError):
                     error_count += 1
                     errors.append(f"Invalid captured_at timestamp")
                     continue
                 
-                # Check location frequency to prevent spam
-                if not LocationPrivacyValidator.validate_location_frequency(driver.id, captured_at):
-                    duplicate_count += 1  # Count as duplicate since it's too frequent
-                    continue
-                
                 # Validate coordinate ranges (will be caught by DB constraints too)
-                lat = float(location_data['latitude'])
-                lon = float(location_data['longitude'])
+                lat = float(point.latitude)
+                lon = float(point.longitude)
                 
                 if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
                     error_count += 1
                     errors.append(f"Invalid coordinates: {lat}, {lon}")
                     continue
                 
-                # Create location record
+                candidates.append((point, client_event_id, captured_at, lat, lon))
+                
+            except Exception as e:
+                error_count += 1
+                errors.append(f"Error processing location: {str(e)}")
+                logger.error(f"Location processing error: {str(e)}")
+        
+        # Check location frequency to prevent spam - one lookup for the whole batch
+        frequency_mask = LocationPrivacyValidator.validate_location_frequency_batch(
+            driver.id, [candidate[2] for candidate in candidates]
+        )
+        
+        # Second pass: create location records
+        for (point, client_event_id, captured_at, lat, lon), is_allowed in zip(candidates, frequency_mask):
+            if not is_allowed:
+                duplicate_count += 1  # Count as duplicate since it's too frequent
+                continue
+            
+            try:
                 location = DriverLocation(
                     driver_id=driver.id,
                     duty_id=duty_id,
                     tracking_session_id=session.id,
                     latitude=lat,
                     longitude=lon,
-                    altitude=location_data.get('altitude'),
-                    accuracy=location_data.get('accuracy'),
-                    speed=location_data.get('speed'),
-                    bearing=location_data.get('bearing'),
+                    altitude=point.altitude,
+                    accuracy=point.accuracy,
+                    speed=point.speed,
+                    bearing=point.bearing,
                     captured_at=captured_at,
                     source='mobile',
                     client_event_id=client_event_id,
-                    battery_level=location_data.get('battery_level'),
-                    network_type=location_data.get('network_type'),
-                    signal_strength=location_data.get('signal_strength'),
-                    is_mocked=location_data.get('is_mocked', False)
+                    battery_level=point.battery_level,
+                    network_type=point.network_type,
+                    signal_strength=point.signal_strength,
+                    is_mocked=point.is_mocked
                 )
                 
                 db.session.add(location)
@@ -482,7 +644,7 @@ def submit_location_batch():
         
         # Update session metadata
         session.total_points += processed_count
-        session.updated_at = get_ist_time_naive()
+        session.updated_at = now_ist
         
         # Commit all changes
         db.session.commit()
@@ -607,9 +769,10 @@ def start_tracking_session(duty_id):
             is_active=True
         ).all()
         
+        now_ist = get_ist_time_naive()
         for session in existing_sessions:
             session.is_active = False
-            session.session_end = get_ist_time_naive()
+            session.session_end = now_ist
         
         # Create new tracking session
         new_session = TrackingSession(
@@ -668,9 +831,10 @@ def stop_tracking_session(duty_id):
             }), 404
         
         # End the session
+        now_ist = get_ist_time_naive()
         session.is_active = False
-        session.session_end = get_ist_time_naive()
-        session.duration = int((session.session_end - session.session_start).total_seconds())
+        session.session_end = now_ist
+        session.duration = int((now_ist - session.session_start).total_seconds())
         
         db.session.commit()
         
@@ -1,40 +1,380 @@
 import os
+import re
 import logging
 import uuid
+import hashlib
+import mimetypes
 import traceback
-from flask import Flask, send_from_directory, session, request, jsonify, render_template, g
-from flask_sqlalchemy import SQLAlchemy
+import click
+import importlib
+import functools
+import socket
+import stat
+import time
+import weakref
+from urllib.parse import quote
+from flask import Flask, Response, send_from_directory, request, jsonify, render_template, g, url_for, redirect, abort
+from flask.sessions import SecureCookieSessionInterface
+from jinja2 import FileSystemBytecodeCache
 from flask_migrate import Migrate
-from flask_wtf.csrf import CSRFProtect, CSRFError
-from flask_jwt_extended import JWTManager
+from flask_wtf.csrf import CSRFError
 from flask_cors import CORS
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event, exists, select, update
+from sqlalchemy.orm import Session
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.exceptions import HTTPException
-from flask_login import LoginManager
-from flask_socketio import SocketIO
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from werkzeug.security import safe_join
+from flask_login import current_user
+from flask_socketio import emit, join_room
 from datetime import datetime, timedelta
+from timezone_utils import get_ist_time, get_ist_time_naive, convert_to_ist
+from utils.database_config import database_engine_options, resolve_database_url
+
+# Optional fast JSON codec for the hot API endpoints
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 # Import centralized logging configuration
 from utils.logging_config import setup_logging, log_request_start, log_request_end, get_logger
 from utils.monitoring import setup_monitoring
+from utils.json_provider import ORJSONProvider
+from utils.compression import setup_compression, send_precompressed, precompressed_files, PRECOMPRESS_EXTENSIONS
+
+# Extension singletons live in extensions.py; re-exported here for the
+# modules that import them from app
+from extensions import Base, db, login_manager, socketio, csrf, jwt, limiter
+from models import (
+    User, Driver, Branch, Region, Duty, VehicleTracking,
+    UserRole, UserStatus, DriverStatus, DutyStatus,
+)
+
+# Heavy symbols resolved on first attribute access (PEP 562) so importing
+# this module doesn't pull them in, e.g. `from app import calculate_tripsheet`
+_LAZY_ATTRS = {
+    'generate_password_hash': 'werkzeug.security',
+    'check_password_hash': 'werkzeug.security',
+    'calculate_tripsheet': 'utils',
+}
+
+def __getattr__(name):
+    module_path = _LAZY_ATTRS.get(name)
+    if module_path is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_path), name)
+    globals()[name] = value
+    return value
+
+# moment.js-style tokens used by templates mapped to strftime patterns
+_MOMENT_FMT = {
+    'DD/MM/YYYY': '%d/%m/%Y',
+    'MMMM DD, YYYY': '%B %d, %Y',
+    'MMM DD, YYYY': '%b %d, %Y',
+    'YYYY-MM-DD': '%Y-%m-%d',
+    'YYYY-MM-DD HH:mm:ss': '%Y-%m-%d %H:%M:%S',
+    'HH:mm:ss': '%H:%M:%S',
+    'HH:mm': '%H:%M',
+    'DD MMM': '%d %b',
+}
+
+class MomentJS:
+    """Minimal moment.js-style date wrapper for templates"""
+    __slots__ = ('dt',)
+
+    def __init__(self, datetime_obj=None):
+        if datetime_obj is None:
+            self.dt = get_ist_time()
+        else:
+            self.dt = convert_to_ist(datetime_obj)
+
+    def format(self, format_str):
+        if not self.dt:
+            return ''
+        return self.dt.strftime(_MOMENT_FMT.get(format_str, '%Y-%m-%d'))
+
+    def fromNow(self):
+        if not self.dt:
+            return ''
+        now = get_ist_time()
+        diff = now - self.dt
+        if diff.days > 0:
+            return f"{diff.days} days ago"
+        elif diff.seconds > 3600:
+            hours = diff.seconds // 3600
+            return f"{hours} hours ago"
+        elif diff.seconds > 60:
+            minutes = diff.seconds // 60
+            return f"{minutes} minutes ago"
+        else:
+            return "Just now"
+
+    def date(self):
+        return self.dt.date() if self.dt else None
+
+# Pending-approval duty count for the admin navbar badge, shared across
+# requests for a short TTL and reset whenever a duty's status is assigned
+PENDING_DUTIES_TTL = 30  # seconds
+_pending_duties_cache = {'ts': 0.0, 'val': 0}
+
+def invalidate_pending_duties_count(*args):
+    _pending_duties_cache['ts'] = 0.0
+
+def get_pending_duties_count():
+    if 'pending_duties_count' in g:
+        return g.pending_duties_count
+    now = time.monotonic()
+    if now - _pending_duties_cache['ts'] >= PENDING_DUTIES_TTL:
+        _pending_duties_cache['val'] = Duty.query.filter_by(status=DutyStatus.PENDING_APPROVAL).count()
+        _pending_duties_cache['ts'] = now
+    g.pending_duties_count = _pending_duties_cache['val']
+    return g.pending_duties_count
+
+def _invalidate_pending_duties_on_bulk_write(orm_execute_state):
+    """Bulk update()/delete() statements skip attribute events, so any that
+    target Duty reset the count as well"""
+    if ((orm_execute_state.is_update or orm_execute_state.is_delete)
+            and orm_execute_state.bind_mapper is not None
+            and orm_execute_state.bind_mapper.class_ is Duty):
+        invalidate_pending_duties_count()
+
+# Registered once at import; create_app runs more than once per process
+event.listen(Duty.status, 'set', invalidate_pending_duties_count)
+event.listen(Duty, 'after_delete', invalidate_pending_duties_count)
+event.listen(Session, 'do_orm_execute', _invalidate_pending_duties_on_bulk_write)
+
+# Readiness probe body; only the timestamp changes, so the JSON is rebuilt
+# at most once per second instead of serialized on every probe
+_health_cache = {'second': None, 'body': b''}
+
+def get_health_body():
+    second = int(time.time())
+    if _health_cache['second'] != second:
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _health_cache['body'] = b'{"status":"ok","timestamp":"%s"}' % stamp.encode()
+        _health_cache['second'] = second
+    return _health_cache['body']
+
+# Resolved by calculate_salary on first use
+_calculate_tripsheet = None
+_calculate_tripsheet_batch = None
+
+def load_user(user_id):
+    """Flask-Login user loader: one primary-key lookup per request. Nothing
+    is kept across requests, so deactivation and role changes made by any
+    worker apply on the user's next request."""
+    cache = g.setdefault('_user_cache', {})
+    if user_id not in cache:
+        cache[user_id] = db.session.get(User, int(user_id))
+    return cache[user_id]
+
+@functools.lru_cache(maxsize=8)
+def warm_database_host(host, port):
+    """Resolve the database host once at boot so a bad hostname is reported
+    at startup and the first query doesn't pay the DNS lookup"""
+    try:
+        socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return True
+    except (socket.gaierror, UnicodeError) as e:
+        logging.getLogger('database').warning(f"Database host {host!r} does not resolve: {e}")
+        return False
+
+def compile_origin_pattern(origins):
+    """Compile an origin allowlist into one anchored, case-insensitive regex.
+    '*' matches within the host only (e.g. https://*.replit.app)."""
+    alternatives = (re.escape(origin).replace(r'\*', r'[^/]*') for origin in origins if origin)
+    return re.compile(r'(?:%s)\Z' % '|'.join(alternatives), re.IGNORECASE)
+
+def _insert_ignore(table, rows, conflict_cols):
+    """INSERT rows, skipping any whose conflict_cols match an existing row.
+    Postgres and SQLite do this server-side with ON CONFLICT (conflict_cols)
+    DO NOTHING; a clash on any other unique key still raises."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert as plain_insert
+        for row in rows:
+            clash = exists().where(*(table.c[col] == row[col] for col in conflict_cols))
+            if not db.session.scalar(select(clash)):
+                db.session.execute(plain_insert(table).values(**row))
+        return
+    db.session.execute(insert(table).values(rows).on_conflict_do_nothing(index_elements=conflict_cols))
 
-# Configure centralized logging system
-loggers = setup_logging()
+# Engines of every app built in this process. Forked workers (e.g. gunicorn
+# --preload) dispose them so each gets its own pool instead of sharing the
+# parent's sockets; held weakly so discarded apps can still be collected.
+_fork_disposed_engines = weakref.WeakSet()
 
-class Base(DeclarativeBase):
-    pass
+def _dispose_engines_in_child():
+    for engine in list(_fork_disposed_engines):
+        # close=False leaves the parent's connections open for the parent
+        engine.dispose(close=False)
 
-db = SQLAlchemy(model_class=Base)
-login_manager = LoginManager()
-socketio = SocketIO()
-csrf = CSRFProtect()
-jwt = JWTManager()
-limiter = Limiter(key_func=get_remote_address)
+# Fork hooks can't be unregistered, so there is exactly one, installed at import
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engines_in_child)
+
+def _dispose_engines_after_fork(app):
+    """Have forked workers dispose this app's engines. Without
+    os.register_at_fork, do the same from a gunicorn post_fork(server,
+    worker) hook."""
+    with app.app_context():
+        _fork_disposed_engines.update(db.engines.values())
+
+def jinja_bytecode_cache(directory):
+    """Compiled-template cache for the Jinja environment. Cached bytecode is
+    executed as template code, so the directory must be private to this user:
+    without JINJA_CACHE_DIR, Jinja creates and owner-checks a 0700 directory
+    of its own; a configured directory is created 0700 and refused unless it
+    is owned by us and closed to group/other. '' disables the cache."""
+    if directory is None:
+        return FileSystemBytecodeCache()
+    if not directory:
+        return None
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if (not stat.S_ISDIR(st.st_mode) or st.st_mode & 0o077
+            or (hasattr(os, 'getuid') and st.st_uid != os.getuid())):
+        logging.getLogger(__name__).warning(
+            f"Not caching templates in {directory!r}: it must be a directory owned by this user with mode 0700"
+        )
+        return None
+    return FileSystemBytecodeCache(directory)
+
+def schema_is_current(expected_version):
+    """True when alembic_version already holds expected_version"""
+    if not expected_version:
+        return False
+    from sqlalchemy import text
+    from sqlalchemy.exc import SQLAlchemyError
+    try:
+        current = db.session.scalar(text("SELECT version_num FROM alembic_version"))
+    except SQLAlchemyError:
+        # First run: no alembic_version table yet
+        db.session.rollback()
+        return False
+    return current == expected_version
+
+def _demo_base_seeded():
+    """Whether the admin user and default branches already exist, so a
+    repeated seed run skips inserting them (and hashing the password)"""
+    return db.session.scalar(select(
+        exists().where(User.username == 'admin')
+        & exists().where(Branch.code == 'CHN')
+        & exists().where(Branch.code == 'BLR')
+    ))
+
+def _seed_admin_and_branches():
+    """Insert the demo admin user, default region and branches if missing"""
+    from utils.security import hash_password
+
+    _insert_ignore(User.__table__, [{
+        'username': 'admin',
+        'email': 'admin@plstravels.com',
+        'password_hash': hash_password(os.environ.get('ADMIN_INITIAL_PASSWORD', 'admin123')),
+        'role': UserRole.ADMIN,
+        'status': UserStatus.ACTIVE,
+        'first_name': 'System',
+        'last_name': 'Administrator',
+    }], conflict_cols=['username'])
+
+    # Default region and branches for demo mode
+    _insert_ignore(Region.__table__, [{
+        'name': 'South India',
+        'code': 'SI',
+        'state': 'Tamil Nadu',
+        'country': 'India',
+    }], conflict_cols=['code'])
+    # Resolved inside the INSERT rather than with a separate round trip
+    region_id = select(Region.id).where(Region.code == 'SI').scalar_subquery()
+    _insert_ignore(Branch.__table__, [
+        {'name': 'Chennai HQ', 'code': 'CHN', 'region_id': region_id, 'city': 'Chennai',
+         'address': 'Chennai, Tamil Nadu', 'target_revenue_monthly': 500000.0},
+        {'name': 'Bangalore Office', 'code': 'BLR', 'region_id': region_id, 'city': 'Bangalore',
+         'address': 'Bangalore, Karnataka', 'target_revenue_monthly': 400000.0},
+    ], conflict_cols=['code'])
+
+def seed_demo_data():
+    """Seed demo admin user, default branches and the admin driver profile."""
+    
+    # CRITICAL: Prevent demo seeding in production environments
+    is_production = (os.environ.get('FLASK_ENV') == 'production' or 
+                    os.environ.get('REPL_DEPLOYMENT') == 'true')
+    
+    if is_production:
+        raise RuntimeError("SECURITY ERROR: Demo seeding cannot be run in production.")
+    
+    if not _demo_base_seeded():
+        _seed_admin_and_branches()
+
+    # Active driver profile for the admin user, self-approved so they can
+    # access duty management
+    admin_user = db.session.execute(
+        select(User.id, User.first_name, User.last_name).where(User.username == 'admin').limit(1)
+    ).one()
+    approved_at = datetime.utcnow()
+    if not db.session.scalar(select(exists().where(Driver.user_id == admin_user.id))):
+        existing_admin_driver_id = db.session.scalar(
+            select(Driver.id).where(Driver.employee_id == 'EMP000001')
+        )
+        if existing_admin_driver_id is not None:
+            # Link the existing EMP000001 driver to the admin if it isn't linked yet
+            db.session.execute(
+                update(Driver)
+                .where(Driver.id == existing_admin_driver_id, Driver.user_id.is_(None))
+                .values(user_id=admin_user.id, status=DriverStatus.ACTIVE,
+                        approved_by=admin_user.id, approved_at=approved_at)
+            )
+        else:
+            default_branch_id = db.session.scalar(select(Branch.id).order_by(Branch.id).limit(1))
+            if default_branch_id is not None:
+                _insert_ignore(Driver.__table__, [{
+                    'user_id': admin_user.id,
+                    'branch_id': default_branch_id,
+                    'employee_id': 'EMP000001',  # Special ID for admin
+                    'full_name': f"{admin_user.first_name} {admin_user.last_name}",
+                    'status': DriverStatus.ACTIVE,
+                    'approved_by': admin_user.id,
+                    'approved_at': approved_at,
+                }], conflict_cols=['user_id'])
+
+    # Activate any pending drivers (for demo/testing purposes only)
+    db.session.execute(
+        update(Driver)
+        .where(Driver.status == DriverStatus.PENDING)
+        .values(status=DriverStatus.ACTIVE, approved_by=admin_user.id, approved_at=approved_at)
+    )
+    
+    db.session.commit()
+    print("Demo data seeded")
+
+@click.option('--seed', is_flag=True, help='Also seed demo data (non-production only).')
+def init_db(seed=False):
+    """Create any missing database tables."""
+    db.create_all()
+    print("Database tables created")
+    if seed:
+        seed_demo_data()
+
+class PermanentSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that are permanent from the moment they're opened, so
+    no per-request hook is needed to set session.permanent"""
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is not None and not session.permanent:
+            session.permanent = True
+        return session
 
 def create_app():
+    # Configure centralized logging system (level from LOG_LEVEL)
+    setup_logging()
+
     # Create the app
     app = Flask(__name__)
     # Enforce SESSION_SECRET requirement
@@ -46,6 +386,10 @@ def create_app():
     # x_proto=1: Trust one proxy for X-Forwarded-Proto header (HTTPS detection)
     # x_host=1: Trust one proxy for X-Forwarded-Host header (hostname)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
+    app.session_interface = PermanentSessionInterface()
+    if ORJSON_AVAILABLE:
+        # jsonify and the tojson filter serialize through orjson
+        app.json = ORJSONProvider(app)
     
     # CORS Configuration for mobile apps and production deployment
     # Allow requests from Replit domains and localhost for development
@@ -62,45 +406,26 @@ def create_app():
         production_origins = os.environ.get('CORS_ALLOWED_ORIGINS', 'https://*.replit.app,https://*.repl.co')
         allowed_origins = [origin.strip() for origin in production_origins.split(',')]
     
-    CORS(app, origins=allowed_origins, 
+    CORS(app, origins=[compile_origin_pattern(allowed_origins)], 
          supports_credentials=True,  # Enable credentials for secure cookie handling
          allow_headers=["Content-Type", "Authorization", "X-Requested-With", "X-Correlation-ID"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
          expose_headers=["X-Correlation-ID"])  # Expose correlation ID to clients
 
     # Configure the database with proper environment handling
-    database_url = os.environ.get("DATABASE_URL", "sqlite:///instance/pls_travels_dev.db")
+    database_url = resolve_database_url(os.environ.get("DATABASE_URL"))
     
     # Configure for PostgreSQL production database
-    if database_url.startswith(("postgresql://", "postgres://")):
-        # Ensure psycopg2 driver is specified
-        if database_url.startswith("postgresql://"):
-            database_url = database_url.replace("postgresql://", "postgresql+psycopg2://", 1)
-        
+    if database_url.startswith("postgresql+"):
         # Log connection info (without password) for debugging
         from urllib.parse import urlparse
         parsed = urlparse(database_url)
         print(f"🔌 Connecting to PostgreSQL: host={parsed.hostname}, db={parsed.path[1:]}, user={parsed.username}, password_present={'*' * len(parsed.password or '')}")
-        
-        app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-            "pool_size": 5,
-            "pool_recycle": 300,
-            "pool_pre_ping": True,
-            "max_overflow": 10,
-            "connect_args": {
-                "sslmode": "require" if (os.environ.get('FLASK_ENV') == 'production' or os.environ.get('REPL_DEPLOYMENT') == 'true') else "prefer",
-                "connect_timeout": 30,
-                "application_name": "pls_travels"
-            }
-        }
-    else:
-        # Fallback to SQLite for local development
-        app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-            "pool_recycle": 300,
-            "pool_pre_ping": True,
-        }
+        warm_database_host(parsed.hostname, parsed.port or 5432)
+    
+    # Pool, TLS and driver settings are shared with the CLI's engine
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = database_engine_options(database_url)
     
     # File upload configuration
     app.config["UPLOAD_FOLDER"] = "uploads"
@@ -108,6 +433,7 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    _dispose_engines_after_fork(app)
     login_manager.init_app(app)
     csrf.init_app(app)
     
@@ -175,17 +501,6 @@ def create_app():
     
     # === END SECURITY CONFIGURATION ===
     
-    # Initialize SocketIO with proper security and extended configuration
-    # For development, allow all Replit domains with proper wildcard matching
-    allowed_origins = [
-        "https://*.replit.app", 
-        "https://*.replit.dev", 
-        "https://*.pike.replit.dev",
-        "https://*-*.pike.replit.dev",  # More specific pattern for complex Replit domains
-        "https://*.*.*replit.dev",      # Even more permissive for development
-        "http://localhost:5000",
-        "http://127.0.0.1:5000"
-    ]
     # Disable WebSocket temporarily to fix stability issues
     # socketio.init_app(
     #     app, 
@@ -199,35 +514,8 @@ def create_app():
     # )
 
     # User loader for Flask-Login
-    @login_manager.user_loader
-    def load_user(user_id):
-        from models import User
-        return User.query.get(int(user_id))
-    
-    # Add template functions
-    from datetime import datetime, timedelta
-    import pytz
-    
-    # Configure IST timezone for the application
-    IST = pytz.timezone('Asia/Kolkata')
-    
-    def get_ist_time():
-        """Get current time in IST timezone"""
-        return datetime.now(IST)
-    
-    def get_ist_time_naive():
-        """Get current IST time as naive datetime for database storage"""
-        return datetime.now(IST).replace(tzinfo=None)
-    
-    def convert_to_ist(dt):
-        """Convert datetime to IST timezone"""
-        if dt is None:
-            return None
-        if dt.tzinfo is None:
-            # Assume UTC if no timezone info
-            dt = pytz.utc.localize(dt)
-        return dt.astimezone(IST)
-    
+    login_manager.user_loader(load_user)
+
     # JWT Configuration with separate secret for enhanced security
     jwt_secret = os.environ.get('JWT_SECRET_KEY')
     if not jwt_secret:
@@ -344,81 +632,48 @@ def create_app():
     
     # === END GLOBAL ERROR HANDLING ===
 
+    # Health check endpoint for deployment; registered ahead of monitoring so
+    # probes get this constant body rather than the full check suite, which
+    # stays available at /health/detailed
+    @app.route('/health')
+    def health():
+        """Simple health check endpoint for deployment readiness"""
+        return Response(get_health_body(), mimetype='application/json')
+
     # Set up monitoring middleware and health endpoints
     setup_monitoring(app)
     
+    # Opt-in (COMPRESS_ENABLED) compression of JSON/text responses; the other
+    # after_request hooks only touch headers
+    setup_compression(app)
+    
     # Configure application logger to use structured logging
     app.logger = get_logger('app')
     current_db_url = app.config.get("SQLALCHEMY_DATABASE_URI", database_url)
     app.logger.info("PLS Travels application starting up", extra={
         'environment': os.environ.get('FLASK_ENV', 'development'),
         'deployment_id': os.environ.get('REPL_DEPLOYMENT_ID', 'unknown'),
-        'database_type': 'postgresql' if current_db_url.startswith(('postgresql://', 'postgres://')) else 'sqlite'
+        'database_type': 'postgresql' if current_db_url.startswith('postgresql') else 'sqlite'
     })
 
+    # Persist compiled templates across restarts/workers (JINJA_CACHE_DIR='' disables)
+    app.jinja_env.bytecode_cache = jinja_bytecode_cache(os.environ.get('JINJA_CACHE_DIR'))
+
     # Make datetime and timedelta available in templates
     app.jinja_env.globals['datetime'] = datetime
     app.jinja_env.globals['timedelta'] = timedelta
     app.jinja_env.globals['get_ist_time'] = get_ist_time
     app.jinja_env.globals['get_ist_time_naive'] = get_ist_time_naive
     app.jinja_env.globals['convert_to_ist'] = convert_to_ist
-    
-    @app.template_global()
-    def moment(dt=None):
-        class MomentJS:
-            def __init__(self, datetime_obj=None):
-                if datetime_obj is None:
-                    self.dt = get_ist_time()
-                else:
-                    self.dt = convert_to_ist(datetime_obj)
-            
-            def format(self, format_str):
-                if not self.dt:
-                    return ''
-                
-                format_mapping = {
-                    'DD/MM/YYYY': self.dt.strftime('%d/%m/%Y'),
-                    'MMMM DD, YYYY': self.dt.strftime('%B %d, %Y'),
-                    'MMM DD, YYYY': self.dt.strftime('%b %d, %Y'), 
-                    'YYYY-MM-DD': self.dt.strftime('%Y-%m-%d'),
-                    'YYYY-MM-DD HH:mm:ss': self.dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'HH:mm:ss': self.dt.strftime('%H:%M:%S'),
-                    'HH:mm': self.dt.strftime('%H:%M'),
-                    'DD MMM': self.dt.strftime('%d %b'),
-                }
-                return format_mapping.get(format_str, self.dt.strftime('%Y-%m-%d'))
-            
-            def fromNow(self):
-                if not self.dt:
-                    return ''
-                now = get_ist_time()
-                diff = now - self.dt
-                if diff.days > 0:
-                    return f"{diff.days} days ago"
-                elif diff.seconds > 3600:
-                    hours = diff.seconds // 3600
-                    return f"{hours} hours ago"
-                elif diff.seconds > 60:
-                    minutes = diff.seconds // 60
-                    return f"{minutes} minutes ago"
-                else:
-                    return "Just now"
-            
-            def date(self):
-                return self.dt.date() if self.dt else None
-        
-        return MomentJS(dt)
+    app.jinja_env.globals['moment'] = MomentJS
     
     # Add context processor for pending duties notifications
     @app.context_processor
     def inject_notifications():
-        from flask_login import current_user
-        from models import UserRole, DutyStatus, Duty
-        
         if current_user.is_authenticated:
             pending_duties_count = 0
             if current_user.role == UserRole.ADMIN:
-                pending_duties_count = Duty.query.filter_by(status=DutyStatus.PENDING_APPROVAL).count()
+                pending_duties_count = get_pending_duties_count()
             
             return dict(pending_duties_count=pending_duties_count)
         return dict(pending_duties_count=0)
@@ -456,171 +711,80 @@ def create_app():
     app.register_blueprint(tracking_bp, url_prefix='/tracking')
     app.register_blueprint(api_tracking_bp)  # Mobile tracking API includes /api/v1/tracking/*
     
-    # Make session permanent and handle database timeouts
-    @app.before_request
-    def make_session_permanent():
-        session.permanent = True
-        
-        # Skip database ping for health check endpoint to allow fast responses
-        if request.path == '/health' and request.method == 'GET':
-            return
-        
-        # Handle database connection issues for other routes
-        try:
-            from sqlalchemy import text
-            db.session.execute(text('SELECT 1'))
-        except Exception as e:
-            print(f"Database connection issue: {e}")
-            db.session.rollback()
-
-    # Create tables
     # Check OTP system configuration on startup
     from utils.config_validator import get_otp_config_status
     print(f"OTP Configuration: {get_otp_config_status()}")
     
+    # Create tables at boot only where explicitly allowed (default: off in production);
+    # deployments run `flask init-db` (or Alembic) once instead. Demo data is
+    # seeded on demand with `flask seed` / `flask init-db --seed`.
+    is_production = (os.environ.get('FLASK_ENV') == 'production' or 
+                    os.environ.get('REPL_DEPLOYMENT') == 'true')
+    app.config['AUTO_CREATE_TABLES'] = os.environ.get(
+        'AUTO_CREATE_TABLES', 'false' if is_production else 'true'
+    ).lower() == 'true'
+    
+    # Alembic revision the deployed image was built against; when the database
+    # already reports it, the create_all() table existence sweep is skipped
+    app.config['EXPECTED_SCHEMA_VERSION'] = os.environ.get('EXPECTED_SCHEMA_VERSION')
+    
     with app.app_context():
-        import models  # noqa: F401
-        db.create_all()
-        
-        # Import models needed for checks
-        from models import User, Branch
-        from werkzeug.security import generate_password_hash
-        
-        # Only create demo data if explicitly enabled (SECURITY RISK IN PRODUCTION)
-        # SECURITY: Demo seeding disabled by default - only enable with explicit environment flag
-        demo_mode = os.environ.get('DEMO_SEED', 'false').lower() == 'true'
-        
-        # CRITICAL: Prevent demo seeding in production environments
-        is_production = (os.environ.get('FLASK_ENV') == 'production' or 
-                        os.environ.get('REPL_DEPLOYMENT') == 'true')
-        
-        if demo_mode and is_production:
-            raise RuntimeError("SECURITY ERROR: Demo seeding cannot be enabled in production. Set DEMO_SEED=false.")
-        
-        if demo_mode:
-            
-            admin = User.query.filter_by(username='admin').first()
-            if not admin:
-                from models import UserRole, UserStatus
-                admin = User()
-                admin.username = 'admin'
-                admin.email = 'admin@plstravels.com'
-                admin.password_hash = generate_password_hash(os.environ.get('ADMIN_INITIAL_PASSWORD', 'admin123'))
-                admin.role = UserRole.ADMIN
-                admin.status = UserStatus.ACTIVE
-                admin.first_name = 'System'
-                admin.last_name = 'Administrator'
-                db.session.add(admin)
-            
-            # Create default branches only in demo mode
-            if not Branch.query.first():
-                from models import Region
-                # Create a default region first
-                region = Region()
-                region.name = 'South India'
-                region.code = 'SI'
-                region.state = 'Tamil Nadu'
-                region.country = 'India'
-                db.session.add(region)
-                db.session.flush()  # Get the ID
-                
-                chennai = Branch()
-                chennai.name = 'Chennai HQ'
-                chennai.code = 'CHN'
-                chennai.region_id = region.id
-                chennai.city = 'Chennai'
-                chennai.address = 'Chennai, Tamil Nadu'
-                chennai.target_revenue_monthly = 500000.0
-                
-                bangalore = Branch()
-                bangalore.name = 'Bangalore Office'
-                bangalore.code = 'BLR'
-                bangalore.region_id = region.id
-                bangalore.city = 'Bangalore'
-                bangalore.address = 'Bangalore, Karnataka'
-                bangalore.target_revenue_monthly = 400000.0
-                db.session.add(chennai)
-                db.session.add(bangalore)
-            
-            # Create active driver profile for admin user only in demo mode
-            from models import Driver, DriverStatus
-            admin_user = User.query.filter_by(username='admin').first()
-            if admin_user and not admin_user.driver_profile:
-                # Check if a driver with employee_id 'EMP000001' already exists
-                existing_admin_driver = Driver.query.filter_by(employee_id='EMP000001').first()
-                if existing_admin_driver:
-                    # Link existing driver to admin user if not already linked
-                    if not existing_admin_driver.user_id:
-                        existing_admin_driver.user_id = admin_user.id
-                        existing_admin_driver.status = DriverStatus.ACTIVE
-                        existing_admin_driver.approved_by = admin_user.id
-                        existing_admin_driver.approved_at = datetime.utcnow()
-                else:
-                    # Get default branch and create new driver
-                    default_branch = Branch.query.first()
-                    if default_branch:
-                        admin_driver = Driver()
-                        admin_driver.user_id = admin_user.id
-                        admin_driver.branch_id = default_branch.id
-                        admin_driver.employee_id = 'EMP000001'  # Special ID for admin
-                        admin_driver.full_name = f"{admin_user.first_name} {admin_user.last_name}"
-                        admin_driver.status = DriverStatus.ACTIVE  # Make active so they can access duty management
-                        admin_driver.approved_by = admin_user.id  # Self-approved
-                        admin_driver.approved_at = datetime.utcnow()
-                        db.session.add(admin_driver)
-        
-            # Activate any pending drivers (for demo/testing purposes only)
-            pending_drivers = Driver.query.filter_by(status=DriverStatus.PENDING).all()
-            for driver in pending_drivers:
-                driver.status = DriverStatus.ACTIVE
-                driver.approved_by = admin_user.id if admin_user else None
-                driver.approved_at = datetime.utcnow()
-        
-        # Always commit changes (even if no demo data created)
-        db.session.commit()
+        if app.config['AUTO_CREATE_TABLES'] and not schema_is_current(app.config['EXPECTED_SCHEMA_VERSION']):
+            db.create_all()
+    
+    app.cli.command('seed')(seed_demo_data)
+    app.cli.command('init-db')(init_db)
 
     # API routes
     @app.route('/api/calculate-salary', methods=['POST'])
     def calculate_salary():
-        from flask import request, jsonify
-        from utils import calculate_tripsheet
-        
-        data = request.get_json()
+        global _calculate_tripsheet, _calculate_tripsheet_batch
+        if _calculate_tripsheet is None:
+            from utils import calculate_tripsheet as _calculate_tripsheet
+            from utils import calculate_tripsheet_batch as _calculate_tripsheet_batch
+        
+        if ORJSON_AVAILABLE and request.is_json:
+            raw = request.get_data(cache=False)
+            try:
+                data = orjson.loads(raw) if raw else None
+            except orjson.JSONDecodeError:
+                return jsonify({"error": "Invalid JSON"}), 400
+        else:
+            data = request.get_json()
         
         if not data:
             return jsonify({"error": "No input provided"}), 400
 
         # Handle single row or multiple rows
         if isinstance(data, dict):
-            result = calculate_tripsheet(data)
+            result = _calculate_tripsheet(data)
         elif isinstance(data, list):
-            result = [calculate_tripsheet(row) for row in data]
+            result = _calculate_tripsheet_batch(data)
         else:
             return jsonify({"error": "Invalid input format"}), 400
 
+        if ORJSON_AVAILABLE:
+            return Response(orjson.dumps(result), mimetype='application/json')
         return jsonify(result)
 
-    # Health check endpoint for deployment
-    @app.route('/health')
-    def health():
-        """Simple health check endpoint for deployment readiness"""
-        return {'status': 'ok', 'timestamp': datetime.utcnow().isoformat()}, 200
+    # Root route: dashboard endpoint per role. Built paths are cached on first
+    # use, when url_for has a request to build against.
+    from forms import LoginForm
+    role_dashboards = {
+        UserRole.ADMIN: 'admin.dashboard',
+        UserRole.MANAGER: 'manager.dashboard',
+        UserRole.DRIVER: 'driver.dashboard',
+    }
+    role_dashboard_urls = {}
 
-    # Root route
     @app.route('/')
     def index():
-        from flask import redirect, url_for, render_template
-        from flask_login import current_user
-        from forms import LoginForm
-        
         if current_user.is_authenticated:
-            from models import UserRole
-            if current_user.role == UserRole.ADMIN:
-                return redirect(url_for('admin.dashboard'))
-            elif current_user.role == UserRole.MANAGER:
-                return redirect(url_for('manager.dashboard'))
-            elif current_user.role == UserRole.DRIVER:
-                return redirect(url_for('driver.dashboard'))
+            url = role_dashboard_urls.get(current_user.role)
+            if url is None and current_user.role in role_dashboards:
+                url = role_dashboard_urls[current_user.role] = url_for(role_dashboards[current_user.role])
+            if url:
+                return redirect(url)
         
         # Show landing page with login form for unauthenticated users
         form = LoginForm()
@@ -629,32 +793,62 @@ def create_app():
     # Add direct /login route for convenience
     @app.route('/login')
     def login_redirect():
-        from flask import redirect, url_for
         return redirect(url_for('auth.login'))
     
     # Route to serve uploaded files
+    # Let the front proxy stream uploads with sendfile(2) instead of the worker:
+    # USE_X_SENDFILE=true for Apache/lighttpd, or X_ACCEL_REDIRECT_PREFIX (an
+    # nginx `internal` location aliased to UPLOAD_FOLDER, e.g. /protected_uploads)
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+    x_accel_prefix = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
     @app.route('/uploads/<filename>')
     def uploaded_file(filename):
         """Serve uploaded files from the uploads directory"""
         upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        if x_accel_prefix:
+            if safe_join(upload_folder, filename) is None:
+                abort(404)
+            response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            # nginx decodes the URI of the internal redirect, so spaces, '%'
+            # and non-ASCII characters must be percent-encoded
+            response.headers['X-Accel-Redirect'] = f"{x_accel_prefix}/{quote(filename)}"
+            return response
         return send_from_directory(upload_folder, filename)
 
     # SEO routes
     @app.route('/robots.txt')
     def robots_txt():
         """Serve robots.txt for search engine crawlers"""
-        return send_from_directory('static', 'robots.txt')
+        return send_precompressed(app.static_folder, 'robots.txt', max_age=86400)
+
+    # Text assets (css/js/...) come from the precompressed cache; everything
+    # else goes through Flask's regular static file handling
+    def static_file(filename):
+        if os.path.splitext(filename)[1].lower() in PRECOMPRESS_EXTENSIONS:
+            return send_precompressed(app.static_folder, filename, app.get_send_file_max_age(filename))
+        return app.send_static_file(filename)
+    app.view_functions['static'] = static_file
+    # Encoded at the maximum levels here rather than on the first request
+    if app.static_folder:
+        precompressed_files.warm(app.static_folder)
+
+    # Rendered once per day; lastmod is the only dynamic part
+    sitemap_cache = {'day': None, 'body': None, 'etag': None}
 
     @app.route('/sitemap.xml')
     def sitemap_xml():
         """Generate sitemap.xml for search engines"""
-        from flask import render_template, make_response
-        from datetime import datetime
-        
-        response = make_response(render_template('sitemap.xml', 
-                                               current_date=datetime.now().strftime('%Y-%m-%d')))
-        response.headers['Content-Type'] = 'application/xml'
-        return response
+        today = datetime.now().strftime('%Y-%m-%d')
+        if sitemap_cache['day'] != today:
+            body = render_template('sitemap.xml', current_date=today).encode('utf-8')
+            sitemap_cache.update(day=today, body=body, etag=hashlib.sha1(body).hexdigest())
+        
+        response = Response(sitemap_cache['body'], mimetype='application/xml')
+        response.set_etag(sitemap_cache['etag'])
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
 
     return app
 
@@ -663,22 +857,16 @@ app = create_app()
 # WebSocket event handlers for real-time vehicle tracking
 @socketio.on('connect')
 def handle_connect():
-    from flask_login import current_user
-    from flask_socketio import emit
     if current_user.is_authenticated:
         emit('status', {'msg': f'User {current_user.username} connected'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    from flask_login import current_user
     if current_user.is_authenticated:
         print(f'User {current_user.username} disconnected')
 
 @socketio.on('join_tracking')
 def handle_join_tracking(data):
-    from flask_socketio import join_room, emit
-    from flask_login import current_user
-    from models import UserRole
     if current_user.is_authenticated:
         # Join user-specific room
         user_room = f"tracking_{current_user.id}"
@@ -691,10 +879,8 @@ def handle_join_tracking(data):
         if current_user.role in [UserRole.ADMIN, UserRole.MANAGER]:
             if current_user.role == UserRole.ADMIN:
                 # Admin can see all branches
-                from models import Branch
-                branches = Branch.query.all()
-                for branch in branches:
-                    join_room(f"tracking_branch_{branch.id}")
+                for branch_id in db.session.scalars(select(Branch.id)):
+                    join_room(f"tracking_branch_{branch_id}")
             else:
                 # Manager sees only their branches
                 for branch in current_user.managed_branches:
@@ -704,19 +890,12 @@ def handle_join_tracking(data):
 
 @socketio.on('request_vehicle_update')
 def handle_vehicle_update_request():
-    from flask_socketio import emit
-    from flask_login import current_user
     if current_user.is_authenticated:
         # Trigger vehicle location update
         emit('vehicle_update_requested', broadcast=True)
 
 @socketio.on('location_update')
 def handle_driver_location_update(data):
-    from flask_socketio import emit
-    from flask_login import current_user
-    from models import Driver, VehicleTracking, Duty, DutyStatus, db
-    from timezone_utils import get_ist_time_naive
-    
     if not current_user.is_authenticated:
         return
     
@@ -767,7 +946,6 @@ def handle_driver_location_update(data):
         }
         
         # Broadcast to appropriate rooms
-        from flask_socketio import emit
         emit('vehicle_location_update', broadcast_data, to='tracking_global')
         
         # Also broadcast to branch-specific room
@@ -4,17 +4,159 @@ PLS TRAVELS - Comprehensive App Storage System
 Handles uploaded documents and captured photos with organized storage structure
 """
 
+import io
 import os
+import hashlib
+import re
 import json
-import uuid
+import secrets
 import base64
 import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from typing import Optional, Dict, List, Tuple
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 
+# SIMD-accelerated base64 for decoding camera captures; stdlib otherwise
+try:
+    import pybase64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    pybase64 = None
+    PYBASE64_AVAILABLE = False
+
+_b64decode = pybase64.b64decode if PYBASE64_AVAILABLE else base64.b64decode
+
+# Metadata blobs are encoded once as UTF-8 JSON bytes, shared by the index
+# row and the sidecar file
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    def _dump_metadata(metadata: Dict) -> bytes:
+        return orjson.dumps(metadata, option=orjson.OPT_NON_STR_KEYS)
+    _load_metadata = orjson.loads
+else:
+    def _dump_metadata(metadata: Dict) -> bytes:
+        return json.dumps(metadata).encode()
+    _load_metadata = json.loads
+
+# Capture data URIs: the image subtype and the header up to the payload comma
+_DATA_URI_RE = re.compile(r'data:image/(jpe?g|png|webp)(?:;[^,]*)?,', re.IGNORECASE)
+_CAPTURE_EXTENSIONS = {'jpeg': 'jpg', 'jpg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+# Generated filenames: characters dropped from extensions, and base names
+# that need no further sanitizing
+_UNSAFE_EXTENSION_RE = re.compile(r'[^a-z0-9]')
+_SAFE_BASE_NAME_RE = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]*')
+
+# Base64 characters decoded per step when streaming a capture to disk; a
+# multiple of 4 so every window decodes independently
+B64_CHUNK_CHARS = 64 * 1024
+
+# Anything b64decode would skip (line breaks in MIME-wrapped payloads,
+# spaces); it would shift the 4-character alignment of the windows
+_B64_NON_ALPHABET_RE = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+def _write_all(fd: int, data: bytes):
+    """os.write until the whole buffer is on disk"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+# Bytes copied per read when an upload can't be handed to sendfile
+UPLOAD_COPY_CHUNK = 64 * 1024
+
+
+def _copy_stream_to_file(stream, fd: int) -> int:
+    """Copy the rest of an upload stream into the file descriptor and return
+    the byte count. Uploads spooled to a temp file are copied in the kernel
+    with sendfile; in-memory ones are read in bounded chunks."""
+    try:
+        in_fd = stream.fileno()
+        offset = stream.tell()
+        remaining = os.fstat(in_fd).st_size - offset
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        in_fd = None
+
+    if in_fd is not None and hasattr(os, 'sendfile'):
+        copied = 0
+        try:
+            while copied < remaining:
+                sent = os.sendfile(fd, in_fd, offset + copied, remaining - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            if copied:
+                raise
+        else:
+            stream.seek(offset + copied)
+            return copied
+
+    copied = 0
+    while chunk := stream.read(UPLOAD_COPY_CHUNK):
+        _write_all(fd, chunk)
+        copied += len(chunk)
+    return copied
+
+
+def _decode_base64_to_file(data: str, start: int, fd: int) -> int:
+    """Decode data[start:] into the file descriptor in bounded windows,
+    without materializing the whole payload; each window is a single raw
+    write. Returns the number of bytes written"""
+    if _B64_NON_ALPHABET_RE.search(data, start):
+        data, start = _B64_NON_ALPHABET_RE.sub('', data[start:]), 0
+    written = 0
+    for pos in range(start, len(data), B64_CHUNK_CHARS):
+        chunk = _b64decode(data[pos:pos + B64_CHUNK_CHARS])
+        _write_all(fd, chunk)
+        written += len(chunk)
+    return written
+
+def _iter_files(path, recursive: bool = False):
+    """
+    Regular files under path as os.DirEntry objects, whose type and stat
+    results come from (or are cached on) the directory listing; skips the
+    .gitkeep placeholders and missing directories
+    """
+    try:
+        with os.scandir(path) as entries:
+            subdirs = []
+            for entry in entries:
+                if entry.name == '.gitkeep':
+                    continue
+                if entry.is_file():
+                    yield entry
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+    except FileNotFoundError:
+        return
+    for subdir in subdirs:
+        yield from _iter_files(subdir, recursive)
+
+# Sidecar count above which an index rebuild reads a category in parallel
+SIDECAR_PARALLEL_THRESHOLD = 256
+
+
+def _read_sidecar(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'rb') as f:
+            return _load_metadata(f.read())
+    except Exception as e:
+        print(f"Error reading metadata file {path}: {e}")
+        return None
+
 class AppStorageManager:
     """
     Comprehensive storage manager for PLS TRAVELS application
@@ -23,6 +165,12 @@ class AppStorageManager:
     
     def __init__(self, base_path: str = "app_storage"):
         self.base_path = Path(base_path)
+        self.index_path = self.base_path / 'metadata.sqlite'
+        self._local = threading.local()
+        # Sidecar writes and removals leave the request thread; a single
+        # worker applies them in submission order. Its thread only starts
+        # on first use, so forked workers don't inherit it.
+        self._sidecar_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-sidecars')
         self.setup_storage_structure()
         
         # Storage categories with their respective folders
@@ -64,6 +212,22 @@ class AppStorageManager:
             'captures': {'jpg', 'jpeg', 'png', 'webp'},
             'assets': {'pdf', 'jpg', 'jpeg', 'png', 'csv', 'xlsx', 'docx'}
         }
+        
+        # Storage directory -> (category, subcategory) for the stats counters
+        self._stats_keys = {
+            path: (category, subcategory)
+            for category, subcategories in self.storage_categories.items()
+            for subcategory, path in subcategories.items()
+        }
+
+        # File type -> category, for dispatching uploads and migrated files
+        self._type_to_category = {
+            file_type: category
+            for category, subcategories in self.storage_categories.items()
+            for file_type in subcategories
+        }
+        
+        self.setup_metadata_index()
     
     def setup_storage_structure(self):
         """Create the organized directory structure"""
@@ -100,21 +264,144 @@ class AppStorageManager:
             'metadata/documents',
             'metadata/photos',
             'metadata/captures',
+            'metadata/assets',
             
             # Temporary storage
             'temp/uploads',
             'temp/processing'
         ]
         
+        # Workers construct the manager at import; once a run has completed
+        # for this exact layout, a read of the sentinel and one stat per
+        # directory replace the mkdir/touch walk. A directory removed since
+        # then fails the check and the walk recreates it.
+        layout = '\n'.join(directories)
+        sentinel = self.base_path / '.setup_done'
+        try:
+            if (sentinel.read_text() == layout
+                    and all(os.path.isdir(self.base_path / directory) for directory in directories)):
+                return
+        except OSError:
+            pass
+        
         for directory in directories:
             dir_path = self.base_path / directory
             dir_path.mkdir(parents=True, exist_ok=True)
             
             # Create .gitkeep file to ensure directory is tracked
-            gitkeep_path = dir_path / '.gitkeep'
-            if not gitkeep_path.exists():
-                gitkeep_path.touch()
+            (dir_path / '.gitkeep').touch(exist_ok=True)
+        
+        sentinel.write_text(layout)
     
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @property
+    def index(self) -> sqlite3.Connection:
+        """Metadata index connection for the current thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def setup_metadata_index(self):
+        """
+        Create the SQLite index that answers metadata queries. The JSON
+        sidecars remain the per-file record; a new index is filled from them.
+        """
+        is_new = not self.index_path.exists()
+        # Short-lived connection so none is inherited by forked workers
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS files ('
+                    ' category TEXT NOT NULL,'
+                    ' filename TEXT NOT NULL,'
+                    ' user_id INTEGER,'
+                    ' file_type TEXT,'
+                    ' sort_at TEXT NOT NULL,'
+                    ' blob BLOB NOT NULL,'
+                    ' PRIMARY KEY (category, filename))'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_files_user ON files (user_id, category, sort_at DESC)')
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_files_category ON files (category, sort_at DESC)')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS storage_stats ('
+                    ' category TEXT NOT NULL,'
+                    ' subcategory TEXT NOT NULL,'
+                    ' files INTEGER NOT NULL,'
+                    ' bytes INTEGER NOT NULL,'
+                    ' PRIMARY KEY (category, subcategory))'
+                )
+                if is_new:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                        self._read_metadata_sidecars()
+                    )
+                if not conn.execute('SELECT 1 FROM storage_stats LIMIT 1').fetchone():
+                    self._seed_storage_stats(conn)
+        finally:
+            conn.close()
+
+    def _seed_storage_stats(self, conn: sqlite3.Connection):
+        """Count every storage directory once; saves and deletes keep the counters current"""
+        rows = []
+        for path, (category, subcategory) in self._stats_keys.items():
+            file_count = total_size = 0
+            for entry in _iter_files(self.base_path / path):
+                file_count += 1
+                total_size += entry.stat().st_size
+            rows.append((category, subcategory, file_count, total_size))
+        conn.execute('DELETE FROM storage_stats')
+        conn.executemany('INSERT INTO storage_stats VALUES (?, ?, ?, ?)', rows)
+
+    def refresh_storage_stats(self):
+        """Recount the storage directories, e.g. after files were changed outside the app"""
+        with self.index:
+            self._seed_storage_stats(self.index)
+
+    def _update_storage_stats(self, storage_path: Path, files: int, size: int):
+        """Adjust the counters of the subcategory stored at storage_path;
+        runs in the caller's transaction"""
+        key = self._stats_keys.get(storage_path.relative_to(self.base_path).as_posix())
+        if key is None:
+            return  # temp/ fallback, not part of the stats
+        self.index.execute(
+            'UPDATE storage_stats SET files = files + ?, bytes = bytes + ? '
+            'WHERE category = ? AND subcategory = ?',
+            (files, size) + key
+        )
+
+    def _read_metadata_sidecars(self):
+        """Index rows for every existing metadata sidecar"""
+        for category in self.storage_categories:
+            # Unbucketed sidecars come first, so a bucketed copy of the same
+            # file (written later) replaces them
+            paths = [entry.path for entry in _iter_files(self.base_path / 'metadata' / category, recursive=True)
+                     if entry.name.endswith('.json')]
+            
+            # Large categories are read by a thread pool so file reads
+            # overlap; map() keeps the listing order
+            if len(paths) > SIDECAR_PARALLEL_THRESHOLD:
+                with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as pool:
+                    parsed = list(pool.map(_read_sidecar, paths, chunksize=64))
+            else:
+                parsed = map(_read_sidecar, paths)
+            
+            for path, metadata in zip(paths, parsed):
+                if metadata is not None:
+                    yield self._index_row(os.path.basename(path)[:-len('.json')], metadata, category)
+
+    @staticmethod
+    def _index_row(filename: str, metadata: Dict, category: str) -> Tuple:
+        sort_at = metadata.get('uploaded_at', metadata.get('captured_at', ''))
+        return (category, filename, metadata.get('user_id'), metadata.get('file_type'),
+                sort_at, _dump_metadata(metadata))
+
     def get_storage_path(self, category: str, subcategory: str) -> Path:
         """Get the storage path for a specific category and subcategory"""
         if category in self.storage_categories and subcategory in self.storage_categories[category]:
@@ -131,16 +418,16 @@ class AppStorageManager:
         return extension in allowed
     
     def generate_secure_filename(self, original_filename: str, user_id: int, 
-                                file_type: str, prefix: str = '') -> str:
+                                file_type: str, prefix: str = '', now: datetime = None) -> str:
         """Generate a secure, unique filename"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_id = str(uuid.uuid4().hex)[:8]
+        timestamp = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+        unique_id = secrets.token_hex(4)
         
-        # Extract file extension
+        # Extract file extension, keeping only characters safe in a filename
+        extension = ''
         if '.' in original_filename:
-            extension = original_filename.rsplit('.', 1)[1].lower()
-        else:
-            extension = 'jpg'  # Default for captures
+            extension = _UNSAFE_EXTENSION_RE.sub('', original_filename.rsplit('.', 1)[1].lower())
+        extension = extension or 'jpg'  # Default for captures
         
         # Build filename components
         components = []
@@ -149,6 +436,10 @@ class AppStorageManager:
         components.extend([file_type, str(user_id), timestamp, unique_id])
         
         base_name = '_'.join(components)
+        # Prefixes and types are normally plain identifiers, which
+        # secure_filename would return unchanged
+        if _SAFE_BASE_NAME_RE.fullmatch(base_name):
+            return f"{base_name}.{extension}"
         return secure_filename(f"{base_name}.{extension}")
     
     def save_uploaded_file(self, file: FileStorage, user_id: int, 
@@ -170,18 +461,26 @@ class AppStorageManager:
                 return None
             
             # Determine category and subcategory
-            category = 'documents' if file_type in ['aadhar', 'license', 'bank'] else 'photos'
+            category = self._type_to_category.get(file_type, 'photos')
             
             if not self.is_allowed_file(file.filename, category):
                 return None
             
             # Generate secure filename and path
-            filename = self.generate_secure_filename(file.filename, user_id, file_type)
+            # One timestamp for the filename and the metadata
+            now = datetime.now()
+            filename = self.generate_secure_filename(file.filename, user_id, file_type, now=now)
             storage_path = self.get_storage_path(category, file_type)
             file_path = storage_path / filename
             
-            # Save the file
-            file.save(str(file_path))
+            # Save the file, counting its size as it is copied
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                file_size = _copy_stream_to_file(file.stream, fd)
+            finally:
+                os.close(fd)
+            with self.index:
+                self._update_storage_stats(storage_path, 1, file_size)
             
             # Create metadata
             file_metadata = {
@@ -190,8 +489,8 @@ class AppStorageManager:
                 'file_type': file_type,
                 'category': category,
                 'user_id': user_id,
-                'file_size': file_path.stat().st_size,
-                'uploaded_at': datetime.now().isoformat(),
+                'file_size': file_size,
+                'uploaded_at': now.isoformat(),
                 'file_path': str(file_path.relative_to(self.base_path)),
                 'content_type': file.content_type or 'application/octet-stream'
             }
@@ -223,34 +522,33 @@ class AppStorageManager:
             Dict with file info or None if failed
         """
         try:
-            if not image_data or not image_data.startswith('data:image/'):
+            # One pass over the header gives the file extension and where the
+            # payload starts, without splitting off a copy of it
+            match = _DATA_URI_RE.match(image_data) if image_data else None
+            if match is None:
                 return None
-            
-            # Parse base64 data
-            header, encoded = image_data.split(',', 1)
-            
-            # Determine file extension from header
-            if 'jpeg' in header or 'jpg' in header:
-                extension = 'jpg'
-            elif 'png' in header:
-                extension = 'png'
-            elif 'webp' in header:
-                extension = 'webp'
-            else:
-                extension = 'jpg'
-            
-            # Decode image
-            image_bytes = base64.b64decode(encoded)
+            extension = _CAPTURE_EXTENSIONS[match.group(1).lower()]
             
             # Generate filename and path
+            # One timestamp for the filename and the metadata
+            now = datetime.now()
             filename = self.generate_secure_filename(f'capture.{extension}', 
-                                                   user_id, capture_type, 'CAP')
+                                                   user_id, capture_type, 'CAP', now=now)
             storage_path = self.get_storage_path('captures', capture_type)
             file_path = storage_path / filename
             
-            # Save image file
-            with open(file_path, 'wb') as f:
-                f.write(image_bytes)
+            # Decode the image straight into the file
+            try:
+                fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    file_size = _decode_base64_to_file(image_data, match.end(), fd)
+                finally:
+                    os.close(fd)
+            except Exception:
+                file_path.unlink(missing_ok=True)
+                raise
+            with self.index:
+                self._update_storage_stats(storage_path, 1, file_size)
             
             # Create metadata
             capture_metadata = {
@@ -258,8 +556,8 @@ class AppStorageManager:
                 'capture_type': capture_type,
                 'category': 'captures',
                 'user_id': user_id,
-                'file_size': len(image_bytes),
-                'captured_at': datetime.now().isoformat(),
+                'file_size': file_size,
+                'captured_at': now.isoformat(),
                 'file_path': str(file_path.relative_to(self.base_path)),
                 'image_format': extension,
                 'capture_method': 'camera'
@@ -279,25 +577,59 @@ class AppStorageManager:
     
     def save_metadata(self, filename: str, metadata: Dict, category: str):
         """Save metadata for a file"""
+        self.save_metadata_batch([(filename, metadata, category)])
+    
+    def save_metadata_batch(self, records: List[Tuple[str, Dict, str]]):
+        """Save (filename, metadata, category) records, indexing them in one transaction"""
         try:
-            metadata_dir = self.base_path / 'metadata' / category
-            metadata_file = metadata_dir / f"{filename}.json"
-            
-            with open(metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            rows = [self._index_row(*record) for record in records]
+            with self.index:
+                self.index.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', rows)
+            
+            # Reads are served by the index, so the sidecars (serialized
+            # above, as the callers may still mutate the dicts) are written
+            # in the background
+            sidecars = [(self._sidecar_path(filename, category), blob)
+                        for category, filename, *_, blob in rows]
+            self._sidecar_writer.submit(self._write_sidecars, sidecars)
                 
         except Exception as e:
             print(f"Error saving metadata: {e}")
     
+    def _sidecar_path(self, filename: str, category: str) -> Path:
+        """Sidecars are spread over 256 bucket directories per category, so
+        no single directory grows with the number of stored files"""
+        bucket = hashlib.blake2s(filename.encode(), digest_size=1).hexdigest()
+        return self.base_path / 'metadata' / category / bucket / f"{filename}.json"
+    
+    def _remove_sidecar(self, filename: str, category: str):
+        self._sidecar_path(filename, category).unlink(missing_ok=True)
+        # Sidecars written before bucketing sit directly in the category folder
+        (self.base_path / 'metadata' / category / f"{filename}.json").unlink(missing_ok=True)
+    
+    @staticmethod
+    def _write_sidecars(sidecars: List[Tuple[Path, bytes]]):
+        for metadata_file, blob in sidecars:
+            try:
+                try:
+                    fd = os.open(metadata_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                except FileNotFoundError:
+                    # Bucket directories are created on first use
+                    metadata_file.parent.mkdir(exist_ok=True)
+                    fd = os.open(metadata_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    _write_all(fd, blob)
+                finally:
+                    os.close(fd)
+            except Exception as e:
+                print(f"Error saving metadata: {e}")
+    
     def get_file_metadata(self, filename: str, category: str) -> Optional[Dict]:
         """Retrieve metadata for a file"""
         try:
-            metadata_file = self.base_path / 'metadata' / category / f"{filename}.json"
-            
-            if metadata_file.exists():
-                with open(metadata_file, 'r') as f:
-                    return json.load(f)
-            return None
+            row = self.index.execute('SELECT blob FROM files WHERE category = ? AND filename = ?',
+                                     (category, filename)).fetchone()
+            return _load_metadata(row[0]) if row else None
             
         except Exception as e:
             print(f"Error reading metadata: {e}")
@@ -305,87 +637,82 @@ class AppStorageManager:
     
     def get_user_files(self, user_id: int, file_type: str = None) -> List[Dict]:
         """Get all files for a specific user"""
-        files = []
+        query = ("SELECT blob FROM files WHERE user_id = ? "
+                 "AND category IN ('documents', 'photos', 'captures')")
+        params = [user_id]
+        if file_type is not None:
+            query += ' AND file_type = ?'
+            params.append(file_type)
+        query += ' ORDER BY sort_at DESC'
         
-        for category in ['documents', 'photos', 'captures']:
-            metadata_dir = self.base_path / 'metadata' / category
-            
-            if not metadata_dir.exists():
-                continue
-                
-            for metadata_file in metadata_dir.glob('*.json'):
-                try:
-                    with open(metadata_file, 'r') as f:
-                        metadata = json.load(f)
-                    
-                    if metadata.get('user_id') == user_id:
-                        if file_type is None or metadata.get('file_type') == file_type:
-                            files.append(metadata)
-                            
-                except Exception as e:
-                    print(f"Error reading metadata file {metadata_file}: {e}")
-        
-        return sorted(files, key=lambda x: x.get('uploaded_at', x.get('captured_at', '')), reverse=True)
+        return [_load_metadata(blob) for blob, in self.index.execute(query, params)]
 
     def get_files_by_category(self, category: str, user_filter: int = None, page: int = 1, per_page: int = 20) -> Dict:
         """Get files by category with pagination"""
-        files = []
+        where = 'category = ?'
+        params = [category]
+        # Apply user filter if specified
+        if user_filter:
+            where += ' AND user_id = ?'
+            params.append(user_filter)
         
-        metadata_dir = self.base_path / 'metadata' / category
-        if not metadata_dir.exists():
-            return {
-                'files': [],
-                'total': 0,
-                'page': page,
-                'per_page': per_page,
-                'pages': 0
-            }
+        total = self.index.execute(f'SELECT COUNT(*) FROM files WHERE {where}', params).fetchone()[0]
         
-        for metadata_file in metadata_dir.glob('*.json'):
-            try:
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
-                
-                # Apply user filter if specified
-                if user_filter and metadata.get('user_id') != user_filter:
-                    continue
-                    
-                files.append(metadata)
-                
-            except Exception as e:
-                continue
-        
-        # Sort by upload date (newest first)
-        files.sort(key=lambda x: x.get('uploaded_at', x.get('captured_at', '')), reverse=True)
-        
-        # Calculate pagination
-        total = len(files)
-        pages = (total + per_page - 1) // per_page
-        start = (page - 1) * per_page
-        end = start + per_page
+        # Newest first, one page at a time
+        start = max(page - 1, 0) * per_page
+        rows = self.index.execute(
+            f'SELECT blob FROM files WHERE {where} ORDER BY sort_at DESC LIMIT ? OFFSET ?',
+            params + [per_page, start]
+        )
         
         return {
-            'files': files[start:end],
+            'files': [_load_metadata(blob) for blob, in rows],
             'total': total,
             'page': page,
             'per_page': per_page,
-            'pages': pages
+            'pages': (total + per_page - 1) // per_page
         }
     
+    def _is_within_storage(self, path: Path) -> bool:
+        """Whether path, with symlinks and '..' resolved, lies under the storage root"""
+        root = os.path.realpath(self.base_path)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+    
     def delete_file(self, filename: str, category: str) -> bool:
         """Delete a file and its metadata"""
         try:
-            # Find and delete the actual file
-            for subcategory_path in self.storage_categories.get(category, {}).values():
-                file_path = self.base_path / subcategory_path / filename
-                if file_path.exists():
+            row = self.index.execute('SELECT blob FROM files WHERE category = ? AND filename = ?',
+                                     (category, filename)).fetchone()
+            metadata = _load_metadata(row[0]) if row else {}
+            
+            # The indexed path locates the file directly, as long as it stays
+            # inside the storage root; otherwise probe each of the category's
+            # folders
+            stored_path = PurePosixPath(metadata.get('file_path') or '')
+            if stored_path.name == filename and self._is_within_storage(self.base_path / stored_path):
+                candidates = [self.base_path / stored_path]
+            else:
+                candidates = [self.base_path / subcategory_path / filename
+                              for subcategory_path in self.storage_categories.get(category, {}).values()]
+            
+            deleted = None
+            for file_path in candidates:
+                try:
+                    file_size = metadata.get('file_size')
+                    if file_size is None:
+                        file_size = file_path.stat().st_size
                     file_path.unlink()
-                    break
+                except FileNotFoundError:
+                    continue
+                deleted = (file_path.parent, -1, -file_size)
+                break
             
-            # Delete metadata
-            metadata_file = self.base_path / 'metadata' / category / f"{filename}.json"
-            if metadata_file.exists():
-                metadata_file.unlink()
+            # Delete metadata, and update the counters in the same transaction
+            self._sidecar_writer.submit(self._remove_sidecar, filename, category)
+            with self.index:
+                self.index.execute('DELETE FROM files WHERE category = ? AND filename = ?', (category, filename))
+                if deleted:
+                    self._update_storage_stats(*deleted)
             
             return True
             
@@ -398,51 +725,39 @@ class AppStorageManager:
         stats = {
             'total_files': 0,
             'total_size': 0,
-            'categories': {}
+            'categories': {
+                category: {'files': 0, 'size': 0, 'subcategories': {}}
+                for category in ['documents', 'photos', 'captures', 'assets']
+            }
         }
         
-        for category in ['documents', 'photos', 'captures', 'assets']:
-            category_stats = {
-                'files': 0,
-                'size': 0,
-                'subcategories': {}
+        rows = self.index.execute('SELECT category, subcategory, files, bytes FROM storage_stats')
+        for category, subcategory, file_count, total_size in rows:
+            category_stats = stats['categories'].get(category)
+            if category_stats is None:
+                continue
+            category_stats['subcategories'][subcategory] = {
+                'files': file_count,
+                'size': total_size
             }
-            
-            if category in self.storage_categories:
-                for subcategory, path in self.storage_categories[category].items():
-                    subcat_path = self.base_path / path
-                    if subcat_path.exists():
-                        files = list(subcat_path.glob('*'))
-                        file_count = len([f for f in files if f.is_file() and f.name != '.gitkeep'])
-                        total_size = sum(f.stat().st_size for f in files if f.is_file() and f.name != '.gitkeep')
-                        
-                        category_stats['subcategories'][subcategory] = {
-                            'files': file_count,
-                            'size': total_size
-                        }
-                        category_stats['files'] += file_count
-                        category_stats['size'] += total_size
-            
-            stats['categories'][category] = category_stats
-            stats['total_files'] += category_stats['files']
-            stats['total_size'] += category_stats['size']
+            category_stats['files'] += file_count
+            category_stats['size'] += total_size
+            stats['total_files'] += file_count
+            stats['total_size'] += total_size
         
         return stats
     
     def cleanup_temp_files(self, older_than_hours: int = 24):
         """Clean up temporary files older than specified hours"""
         temp_dir = self.base_path / 'temp'
-        if not temp_dir.exists():
-            return
-        
         cutoff_time = datetime.now().timestamp() - (older_than_hours * 3600)
         
-        for temp_file in temp_dir.rglob('*'):
-            if temp_file.is_file() and temp_file.stat().st_mtime < cutoff_time:
+        for entry in _iter_files(temp_dir, recursive=True):
+            if entry.stat().st_mtime < cutoff_time:
                 try:
-                    temp_file.unlink()
+                    os.unlink(entry.path)
                 except Exception as e:
-                    print(f"Error cleaning up temp file {temp_file}: {e}")
+                    print(f"Error cleaning up temp file {entry.path}: {e}")
 
 # Global storage manager instance
 app_storage = AppStorageManager()
@@ -451,56 +766,77 @@ def setup_app_storage():
     """Initialize the app storage system"""
     return app_storage
 
+def _link_or_copy(src: Path, dst: Path):
+    """Hard-link src at dst, replacing dst; copies when the paths are on
+    different filesystems or the filesystem has no hard links"""
+    try:
+        if dst.samefile(src):
+            return  # Already linked by an earlier run
+        dst.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
 def migrate_existing_uploads():
     """Migrate files from the old uploads/ directory to the new organized structure"""
     old_uploads_dir = Path('uploads')
     if not old_uploads_dir.exists():
         return
     
-    migrated_count = 0
+    pending = []
+    migrated_at = datetime.now().isoformat()
     
-    for old_file in old_uploads_dir.glob('*'):
-        if old_file.is_file() and old_file.name != '.gitkeep':
-            try:
-                # Parse filename to determine type
-                filename_parts = old_file.name.split('_')
-                if len(filename_parts) >= 2:
-                    file_type = filename_parts[0]
-                    user_id = filename_parts[1] if filename_parts[1].isdigit() else 1
-                    
-                    # Determine new location
-                    if file_type in ['aadhar', 'license']:
-                        new_path = app_storage.get_storage_path('documents', file_type)
-                    elif file_type in ['profile', 'duty']:
-                        new_path = app_storage.get_storage_path('photos', file_type) 
-                    else:
-                        new_path = app_storage.get_storage_path('assets', 'reports')
-                    
-                    # Copy file to new location
-                    new_file_path = new_path / old_file.name
-                    shutil.copy2(old_file, new_file_path)
-                    
-                    # Create metadata
-                    metadata = {
-                        'original_filename': old_file.name,
-                        'stored_filename': old_file.name,
-                        'file_type': file_type,
-                        'user_id': int(user_id) if str(user_id).isdigit() else 1,
-                        'file_size': old_file.stat().st_size,
-                        'migrated_at': datetime.now().isoformat(),
-                        'migrated_from': str(old_file),
-                        'file_path': str(new_file_path.relative_to(app_storage.base_path))
-                    }
-                    
-                    category = 'documents' if file_type in ['aadhar', 'license'] else 'photos'
-                    app_storage.save_metadata(old_file.name, metadata, category)
-                    
-                    migrated_count += 1
-                    
-            except Exception as e:
-                print(f"Error migrating file {old_file}: {e}")
+    with os.scandir(old_uploads_dir) as entries:
+        old_files = [entry for entry in entries if entry.is_file() and entry.name != '.gitkeep']
+    
+    for entry in old_files:
+        old_file = Path(entry.path)
+        try:
+            # Parse filename to determine type
+            filename_parts = old_file.name.split('_')
+            if len(filename_parts) >= 2:
+                file_type = filename_parts[0]
+                user_id = filename_parts[1] if filename_parts[1].isdigit() else 1
+                
+                # Determine new location; unrecognised types are filed as reports
+                category = app_storage._type_to_category.get(file_type)
+                if category is None:
+                    category, file_type_dir = 'assets', 'reports'
+                else:
+                    file_type_dir = file_type
+                new_path = app_storage.get_storage_path(category, file_type_dir)
+                
+                # Link (or copy) file to new location; uploads/ keeps its copy
+                new_file_path = new_path / old_file.name
+                replaced = new_file_path.exists()
+                _link_or_copy(old_file, new_file_path)
+                if not replaced:
+                    with app_storage.index:
+                        app_storage._update_storage_stats(new_path, 1, entry.stat().st_size)
+                
+                # Create metadata
+                metadata = {
+                    'original_filename': old_file.name,
+                    'stored_filename': old_file.name,
+                    'file_type': file_type,
+                    'user_id': int(user_id) if str(user_id).isdigit() else 1,
+                    'file_size': entry.stat().st_size,
+                    'migrated_at': migrated_at,
+                    'migrated_from': str(old_file),
+                    'file_path': str(new_file_path.relative_to(app_storage.base_path))
+                }
+                
+                pending.append((old_file.name, metadata, category))
+                
+        except Exception as e:
+            print(f"Error migrating file {old_file}: {e}")
+    
+    app_storage.save_metadata_batch(pending)
     
-    print(f"Migration completed. Migrated {migrated_count} files to organized storage.")
+    print(f"Migration completed. Migrated {len(pending)} files to organized storage.")
 
 if __name__ == '__main__':
     # Setup storage and migrate existing files
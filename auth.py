@@ -1,134 +1,318 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
-from models import User, Branch, db, AuditLog
+from sqlalchemy import event, exists, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+from models import User, UserRole, UserStatus, Branch, Driver, DriverStatus, db, AuditLog, manager_branches
 from forms import LoginForm, RegisterForm
+from utils.security import hash_password, verify_password
+from timezone_utils import get_ist_time_naive
+from utils_main import generate_employee_id, process_file_upload
+import atexit
+from datetime import datetime
 import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from app import limiter
 
+logger = logging.getLogger(__name__)
+
 auth_bp = Blueprint('auth', __name__)
 
-def log_audit(action, entity_type=None, entity_id=None, details=None):
-    """Helper function to log audit events"""
-    if current_user.is_authenticated:
-        audit = AuditLog()
-        audit.user_id = current_user.id
-        audit.action = action
-        audit.entity_type = entity_type
-        audit.entity_id = entity_id
-        audit.new_values = json.dumps(details) if details else None
-        audit.ip_address = request.remote_addr
-        audit.user_agent = request.headers.get('User-Agent', '')[:255]
-        db.session.add(audit)
-        
-        # Commit with retry logic for connection issues
+# Dashboard endpoint per role; any other role lands on the driver dashboard
+_DASHBOARDS = {
+    UserRole.ADMIN: 'admin.dashboard',
+    UserRole.MANAGER: 'manager.dashboard',
+}
+
+def _dashboard_redirect(user):
+    return redirect(url_for(_DASHBOARDS.get(user.role, 'driver.dashboard')))
+
+# Registration form role value -> UserRole; anything else registers a driver
+_REGISTER_ROLES = {
+    'admin': UserRole.ADMIN,
+    'manager': UserRole.MANAGER,
+    'driver': UserRole.DRIVER,
+}
+
+# Active branch choices for the registration form, shared across requests for
+# a short TTL (other workers' edits) and reset whenever a branch is written here
+BRANCH_CHOICES_TTL = 60  # seconds
+_branch_choices_cache = {'ts': 0.0, 'val': []}
+
+def invalidate_branch_choices(*args):
+    _branch_choices_cache['ts'] = 0.0
+
+def get_branch_choices():
+    now = time.monotonic()
+    if now - _branch_choices_cache['ts'] >= BRANCH_CHOICES_TTL:
+        rows = db.session.execute(select(Branch.id, Branch.name).where(Branch.is_active.is_(True)))
+        _branch_choices_cache['val'] = [(branch_id, name) for branch_id, name in rows]
+        _branch_choices_cache['ts'] = now
+    return _branch_choices_cache['val']
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Branch, _event, invalidate_branch_choices)
+
+# Stand-in hash verified for unknown or unusable accounts
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+# Audit events are queued by the request and inserted in batches by a
+# background thread: up to AUDIT_BATCH_SIZE rows per transaction, written at
+# most AUDIT_FLUSH_INTERVAL seconds after the first of them was queued
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 0.2  # seconds
+_audit_queue = queue.Queue(maxsize=10000)
+_audit_flusher_lock = threading.Lock()
+_audit_flusher = None
+_audit_exit_hook_registered = False
+
+def _write_audit_batch(app, batch):
+    """Insert queued audit rows in one transaction, with retry logic for connection issues"""
+    with app.app_context():
         max_retries = 3
         for attempt in range(max_retries):
             try:
+                db.session.execute(insert(AuditLog), batch)
                 db.session.commit()
-                break
+                return
             except Exception:
                 db.session.rollback()
                 if attempt < max_retries - 1:
-                    import time
                     time.sleep(0.5)
+        logger.error(f"Dropped {len(batch)} audit log entries after {max_retries} failed attempts")
+
+def _flush_remaining_audits(app):
+    """Write whatever is still queued when the process exits, and give the
+    flusher a moment to finish the batch it is writing"""
+    batch = []
+    while True:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write_audit_batch(app, batch)
+        for _ in batch:
+            _audit_queue.task_done()
+    deadline = time.monotonic() + 5
+    while _audit_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+def _flush_audit_queue(app):
+    while True:
+        batch = [_audit_queue.get()]
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+        while len(batch) < AUDIT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_audit_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        _write_audit_batch(app, batch)
+        for _ in batch:
+            _audit_queue.task_done()
+
+def _start_audit_flusher(app):
+    """Start the flusher on first use, i.e. in the worker process that logs"""
+    global _audit_flusher, _audit_exit_hook_registered
+    with _audit_flusher_lock:
+        if _audit_flusher is None:
+            _audit_flusher = threading.Thread(target=_flush_audit_queue, args=(app,),
+                                              name='audit-flusher', daemon=True)
+            _audit_flusher.start()
+            # Already registered if this is a worker forked after the parent
+            # started its flusher
+            if not _audit_exit_hook_registered:
+                atexit.register(_flush_remaining_audits, app)
+                _audit_exit_hook_registered = True
+
+def _reset_audit_flusher_in_child():
+    """A forked worker inherits the flusher handle but not its thread, so it
+    starts over with its own queue and lock; rows queued before the fork are
+    still written by the parent"""
+    global _audit_queue, _audit_flusher_lock, _audit_flusher
+    _audit_queue = queue.Queue(maxsize=10000)
+    _audit_flusher_lock = threading.Lock()
+    _audit_flusher = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_audit_flusher_in_child)
+
+def log_audit(action, entity_type=None, entity_id=None, details=None):
+    """Helper function to log audit events"""
+    if current_user.is_authenticated:
+        audit = {
+            'user_id': current_user.id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'new_values': json.dumps(details) if details else None,
+            'ip_address': request.remote_addr,
+            # Straight from the WSGI environ, skipping the headers wrapper
+            'user_agent': (request.environ.get('HTTP_USER_AGENT') or '')[:255],
+            'success': True,
+            'created_at': get_ist_time_naive(),
+        }
+        app = current_app._get_current_object()
+        if _audit_flusher is None:
+            _start_audit_flusher(app)
+        try:
+            _audit_queue.put_nowait(audit)
+        except queue.Full:
+            # The flusher is falling behind; write this one inline
+            _write_audit_batch(app, [audit])
+
+def _login_failure_key():
+    # Per client and account: a client spraying one username only limits
+    # itself, never the account owner logging in from elsewhere
+    return f"login-failures:{request.remote_addr}:{request.form.get('username', '')}"
+
+def _login_failed(response):
+    # A failed POST re-renders the form; success redirects
+    return request.method == 'POST' and response.status_code == 200
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 @limiter.limit("10 per minute", error_message="Too many login attempts. Please try again in a minute.")
+# Failures get a smaller budget than the per-IP limit above, so this one
+# trips first for a client guessing one account's password
+@limiter.limit("5 per minute", key_func=_login_failure_key, deduct_when=_login_failed, methods=['POST'],
+               error_message="Too many failed attempts. Please try again in a minute.")
 def login():
     if current_user.is_authenticated:
-        from models import UserRole
-        if current_user.role == UserRole.ADMIN:
-            return redirect(url_for('admin.dashboard'))
-        elif current_user.role == UserRole.MANAGER:
-            return redirect(url_for('manager.dashboard'))
-        else:
-            return redirect(url_for('driver.dashboard'))
+        return _dashboard_redirect(current_user)
     
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
+        username = form.username.data
+        # Only active accounts, and only the columns login reads; the user
+        # loader fetches the full row on later requests
+        user = (User.query
+                .options(load_only(User.id, User.username, User.password_hash, User.role))
+                .filter_by(username=username, status=UserStatus.ACTIVE)
+                .first())
         
-        if user and user.status.name == 'ACTIVE' and user.password_hash and form.password.data and check_password_hash(user.password_hash, form.password.data):
+        # Every attempt runs one hash verification, so response time doesn't
+        # reveal whether the account exists
+        usable = bool(user and user.password_hash)
+        matches, needs_rehash = verify_password(user.password_hash if usable else _DUMMY_PASSWORD_HASH,
+                                                form.password.data or '')
+        password_ok = usable and matches
+        
+        if password_ok:
             login_user(user, remember=form.remember_me.data)
+            # Read before the commit expires the instance
+            welcome = f'Welcome back, {user.username}!'
+            response = _dashboard_redirect(user)
             
-            # Update last login
-            from datetime import datetime
-            user.last_login = datetime.utcnow()
-            user.login_count = (user.login_count or 0) + 1
-            user.failed_login_attempts = 0
+            # Update last login in one statement; the counter is incremented
+            # in SQL so concurrent logins don't lose updates
+            values = {
+                'last_login': datetime.utcnow(),
+                'login_count': func.coalesce(User.login_count, 0) + 1,
+                'failed_login_attempts': 0,
+            }
+            if needs_rehash:
+                # Upgrade the stored hash while the plain password is at hand
+                values['password_hash'] = hash_password(form.password.data)
+            stmt = update(User).where(User.id == user.id).values(**values)
+            
+            # Log successful login
+            log_audit('login_success')
             
             # Commit with retry logic
             max_retries = 3
             for attempt in range(max_retries):
                 try:
+                    db.session.execute(stmt, execution_options={'synchronize_session': False})
                     db.session.commit()
                     break
                 except Exception:
                     db.session.rollback()
                     if attempt < max_retries - 1:
-                        import time
                         time.sleep(0.5)
             
-            # Log successful login
-            log_audit('login_success')
-            
-            flash(f'Welcome back, {user.username}!', 'success')
+            flash(welcome, 'success')
             
             # Redirect based on role
-            from models import UserRole
-            if user.role == UserRole.ADMIN:
-                return redirect(url_for('admin.dashboard'))
-            elif user.role == UserRole.MANAGER:
-                return redirect(url_for('manager.dashboard'))
-            else:
-                return redirect(url_for('driver.dashboard'))
+            return response
         else:
             # Increment failed attempts
             if user:
-                user.failed_login_attempts = (user.failed_login_attempts or 0) + 1
+                db.session.execute(
+                    update(User).where(User.id == user.id)
+                    .values(failed_login_attempts=func.coalesce(User.failed_login_attempts, 0) + 1),
+                    execution_options={'synchronize_session': False})
                 db.session.commit()
             flash('Invalid username or password.', 'error')
     
     return render_template('auth/login.html', form=form)
 
+def _create_user(values):
+    """Insert a user and return it, or None if the username or email is
+    taken. Postgres and SQLite check and insert the username in one
+    statement with ON CONFLICT (username) DO NOTHING ... RETURNING, so
+    concurrent sign-ups can't race. A statement takes one conflict target,
+    so a taken email surfaces as an IntegrityError, which is told apart
+    from any other unique violation before it is reported as taken."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        existing_user = db.session.execute(
+            select(User.id).where(or_(User.username == values['username'],
+                                      User.email == values['email'])).limit(1)
+        ).first()
+        if existing_user:
+            return None
+        user = User(**values)
+        db.session.add(user)
+        db.session.flush()  # Get user ID
+        return user
+    stmt = (dialect_insert(User).values(**values)
+            .on_conflict_do_nothing(index_elements=[User.username])
+            .returning(User))
+    try:
+        with db.session.begin_nested():
+            return db.session.scalar(stmt)
+    except IntegrityError:
+        if db.session.scalar(select(exists().where(User.email == values['email']))):
+            return None
+        raise
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 @limiter.limit("5 per minute", error_message="Too many registration attempts. Please wait before trying again.")
 def register():
     form = RegisterForm()
-    form.branch.choices = [(b.id, b.name) for b in Branch.query.filter_by(is_active=True).all()]
+    form.branch.choices = get_branch_choices()
     
     if form.validate_on_submit():
-        # Check if username or email already exists
-        existing_user = User.query.filter(
-            (User.username == form.username.data) | 
-            (User.email == form.email.data)
-        ).first()
+        # Create new user, unless the username or email is taken
+        user = _create_user({
+            'username': form.username.data,
+            'email': form.email.data,
+            'password_hash': hash_password(form.password.data) if form.password.data else '',
+            'role': _REGISTER_ROLES.get(form.role.data, UserRole.DRIVER),
+        })
         
-        if existing_user:
+        if user is None:
             flash('Username or email already exists.', 'error')
             return render_template('auth/register.html', form=form)
         
-        # Create new user
-        user = User()
-        user.username = form.username.data
-        user.email = form.email.data
-        user.password_hash = generate_password_hash(form.password.data) if form.password.data else ''
-        
-        # Convert string role to UserRole enum
-        from models import UserRole, Driver, DriverStatus
-        role_str = form.role.data if form.role.data else 'driver'
-        user.role = UserRole.ADMIN if role_str == 'admin' else UserRole.MANAGER if role_str == 'manager' else UserRole.DRIVER
-        
-        db.session.add(user)
-        db.session.flush()  # Get user ID
-        
         # If registering as driver, create driver profile
         if user.role == UserRole.DRIVER:
             driver = Driver()
             driver.user_id = user.id
             # Generate unique employee ID
-            from utils_main import generate_employee_id
             driver.employee_id = generate_employee_id()
             driver.full_name = form.full_name.data
             # Note: Only set fields that exist in the Driver model
@@ -143,40 +327,29 @@ def register():
             driver.branch_id = form.branch.data
             driver.status = DriverStatus.PENDING  # Default to pending approval
             
-            # Handle file uploads - Front and Back documents
-            from utils_main import process_file_upload
-            if form.aadhar_photo_front.data:
-                aadhar_front_url = process_file_upload(form.aadhar_photo_front.data, user.id, 'aadhar_front', use_cloud=True)
-                if aadhar_front_url:
-                    driver.aadhar_document_front = aadhar_front_url
-            
-            if form.aadhar_photo_back.data:
-                aadhar_back_url = process_file_upload(form.aadhar_photo_back.data, user.id, 'aadhar_back', use_cloud=True)
-                if aadhar_back_url:
-                    driver.aadhar_document_back = aadhar_back_url
-            
-            if form.license_photo_front.data:
-                license_front_url = process_file_upload(form.license_photo_front.data, user.id, 'license_front', use_cloud=True)
-                if license_front_url:
-                    driver.license_document_front = license_front_url
-                    
-            if form.license_photo_back.data:
-                license_back_url = process_file_upload(form.license_photo_back.data, user.id, 'license_back', use_cloud=True)
-                if license_back_url:
-                    driver.license_document_back = license_back_url
-                    
-            if form.profile_photo.data:
-                profile_url = process_file_upload(form.profile_photo.data, user.id, 'profile', use_cloud=True)
-                if profile_url:
-                    driver.profile_photo = profile_url
+            # Handle file uploads - Front and Back documents, saved concurrently
+            uploads = [(attr, field.data, photo_type) for attr, field, photo_type in (
+                ('aadhar_document_front', form.aadhar_photo_front, 'aadhar_front'),
+                ('aadhar_document_back', form.aadhar_photo_back, 'aadhar_back'),
+                ('license_document_front', form.license_photo_front, 'license_front'),
+                ('license_document_back', form.license_photo_back, 'license_back'),
+                ('profile_photo', form.profile_photo, 'profile'),
+            ) if field.data]
+            if uploads:
+                user_id = user.id  # Read here; worker threads don't touch the session
+                with ThreadPoolExecutor(max_workers=len(uploads)) as pool:
+                    urls = pool.map(lambda upload: process_file_upload(upload[1], user_id, upload[2], use_cloud=True),
+                                    uploads)
+                    for (attr, _, _), url in zip(uploads, urls):
+                        if url:
+                            setattr(driver, attr, url)
             
             db.session.add(driver)
         
         # If registering as manager, assign branch
         elif user.role == UserRole.MANAGER and form.branch.data:
-            branch = Branch.query.get(form.branch.data)
-            if branch:
-                user.managed_branches.append(branch)
+            # The form only accepts active branch ids, so link without loading the row
+            db.session.execute(manager_branches.insert().values(manager_id=user.id, branch_id=form.branch.data))
         
         # Commit with retry logic for database connection issues
         max_retries = 3
@@ -192,7 +365,6 @@ def register():
                     return render_template('auth/register.html', form=form)
                 else:
                     # Wait briefly before retry
-                    import time
                     time.sleep(1)
                     continue
         
@@ -12,84 +12,199 @@ Production-safe database management commands with comprehensive safety features:
 Usage:
     python database_commands.py --help
     python database_commands.py status
+    python database_commands.py status --json   # also info, validate
     python database_commands.py backup
     python database_commands.py migrate --direction upgrade
     python database_commands.py validate
+    python database_commands.py daemon     # read commands from stdin
+                                           # ("cache clear" drops cached reports)
 """
 
 import os
 import sys
 import argparse
+import json
 import logging
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from app import create_app
-from utils.database_manager import database_manager
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Built once per process; the daemon command reuses it (and its engine's
+# connection pool) for every command it runs
+_app = None
+
 def setup_app_context():
     """Setup Flask application context for database operations."""
     # Set a temporary SESSION_SECRET for CLI operations if not set
     if not os.environ.get('SESSION_SECRET'):
         os.environ['SESSION_SECRET'] = 'cli_temp_secret_not_for_production'
     
-    app = create_app()
-    return app.app_context()
+    # The app graph is only imported once a command actually needs it,
+    # so --help and argument errors return immediately
+    global _app
+    if _app is None:
+        # Importing app builds the application (app.app = create_app())
+        from app import app
+        _app = app
+    return _app.app_context()
+
+# Flask-SQLAlchemy resolves relative SQLite paths against the app's instance
+# folder; the lightweight engine has to do the same to open the same file
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+_engine = None
+
+def _lightweight_engine():
+    """SQLAlchemy engine built straight from DATABASE_URL, without the app,
+    but with the app's driver choice and engine options (pool, TLS)."""
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        from sqlalchemy.engine import make_url
+        from utils.database_config import database_engine_options, resolve_database_url
+        database_url = resolve_database_url(os.environ['DATABASE_URL'])
+        url = make_url(database_url)
+        if (url.drivername.startswith('sqlite') and url.database
+                and url.database != ':memory:' and not url.database.startswith('file:')
+                and not os.path.isabs(url.database)):
+            url = url.set(database=os.path.join(INSTANCE_DIR, url.database))
+        _engine = create_engine(url, **database_engine_options(database_url))
+    return _engine
+
+def introspection_context():
+    """Context for the read-only commands (status, info, validate).
+    They only need an engine, so unless the app is already loaded (daemon
+    mode) they skip building it and use a plain engine on DATABASE_URL."""
+    if _app is None and os.environ.get('DATABASE_URL'):
+        get_database_manager().attach_engine(_lightweight_engine())
+        return nullcontext()
+    return setup_app_context()
+
+def get_database_manager():
+    from utils.database_manager import database_manager
+    return database_manager
+
+# Database info and schema validation cost a round trip per table; commands
+# run back to back (e.g. in daemon mode) share results for a few seconds
+DB_REPORT_TTL = 5  # seconds
+_db_report_cache = {}
+
+def _cached_report(name, fetch):
+    now = time.monotonic()
+    entry = _db_report_cache.get(name)
+    if entry is None or now - entry['ts'] >= DB_REPORT_TTL:
+        entry = _db_report_cache[name] = {'ts': now, 'val': fetch()}
+    return entry['val']
+
+def cached_database_info():
+    return _cached_report('info', get_database_manager().get_database_info)
+
+def cached_schema_validation():
+    return _cached_report('validate', get_database_manager().validate_schema_integrity)
+
+def clear_report_cache():
+    _db_report_cache.clear()
+
+def run_concurrently(*calls):
+    """Run independent database calls on separate pooled connections and
+    return their results in order. Falls back to running them one after
+    another when the engine's pool can't hand out that many connections."""
+    from models import db
+    pool_size = getattr(db.engine.pool, 'size', None)
+    if not callable(pool_size) or pool_size() < len(calls):
+        return [call() for call in calls]
+    
+    def in_app_context(call):
+        with _app.app_context():
+            return call()
+    
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(in_app_context, calls))
+
+def write_json(payload):
+    """Write a report as one line of JSON, for --json consumers."""
+    try:
+        import orjson
+    except ImportError:
+        body = json.dumps(payload)
+    else:
+        body = orjson.dumps(payload).decode()
+    sys.stdout.write(body + "\n")
 
 def cmd_status(args):
     """Display comprehensive database status information."""
-    with setup_app_context():
-        print("=" * 60)
-        print("DATABASE STATUS REPORT")
-        print("=" * 60)
+    with introspection_context():
+        database_manager = get_database_manager()
+        if args.json:
+            conn_success, conn_error = database_manager.test_connection()
+            is_valid, issues = cached_schema_validation()
+            write_json({
+                'connection': {'healthy': conn_success, 'error': conn_error},
+                'db_info': cached_database_info(),
+                'schema': {'valid': is_valid, 'issues': issues},
+                'generated_at': args.started_at.isoformat(),
+            })
+            return
+        
+        # The report is collected and written in one go
+        lines = [
+            "=" * 60,
+            "DATABASE STATUS REPORT",
+            "=" * 60,
+        ]
         
         # Connection test
         conn_success, conn_error = database_manager.test_connection()
-        print(f"Connection Status: {'✅ HEALTHY' if conn_success else '❌ FAILED'}")
+        lines.append(f"Connection Status: {'✅ HEALTHY' if conn_success else '❌ FAILED'}")
         if conn_error:
-            print(f"Connection Error: {conn_error}")
+            lines.append(f"Connection Error: {conn_error}")
         
-        print()
+        lines.append("")
         
         # Database information
-        db_info = database_manager.get_database_info()
+        db_info = cached_database_info()
         
-        print("Database Information:")
-        print(f"  Engine: {db_info.get('engine_info', 'Unknown')}")
-        print(f"  Version: {db_info.get('database_version', 'Unknown')}")
-        print(f"  Size: {db_info.get('database_size', 'Unknown')}")
-        print(f"  Tables: {db_info.get('table_count', 'Unknown')}")
-        print(f"  Active Connections: {db_info.get('active_connections', 'Unknown')}")
+        lines += [
+            "Database Information:",
+            f"  Engine: {db_info.get('engine_info', 'Unknown')}",
+            f"  Version: {db_info.get('database_version', 'Unknown')}",
+            f"  Size: {db_info.get('database_size', 'Unknown')}",
+            f"  Tables: {db_info.get('table_count', 'Unknown')}",
+            f"  Active Connections: {db_info.get('active_connections', 'Unknown')}",
+        ]
         
         if 'table_statistics' in db_info:
-            print(f"\nTable Statistics:")
-            for table, count in db_info['table_statistics'].items():
-                print(f"  {table}: {count} records")
+            lines.append("\nTable Statistics:")
+            lines += [f"  {table}: {count} records" for table, count in db_info['table_statistics'].items()]
         
-        print()
+        lines.append("")
         
         # Schema validation
-        is_valid, issues = database_manager.validate_schema_integrity()
-        print(f"Schema Integrity: {'✅ VALID' if is_valid else '❌ ISSUES FOUND'}")
+        is_valid, issues = cached_schema_validation()
+        lines.append(f"Schema Integrity: {'✅ VALID' if is_valid else '❌ ISSUES FOUND'}")
         
         if issues:
-            print("Issues Found:")
-            for issue in issues:
-                print(f"  ⚠️  {issue}")
+            lines.append("Issues Found:")
+            lines += [f"  ⚠️  {issue}" for issue in issues]
         
-        print(f"\nReport Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        lines.append(f"\nReport Generated: {args.started_at:%Y-%m-%d %H:%M:%S}")
+        sys.stdout.write("\n".join(lines) + "\n")
 
 def cmd_backup(args):
     """Create a database backup with optional custom name."""
     with setup_app_context():
+        database_manager = get_database_manager()
         print("Creating database backup...")
         
-        backup_name = args.name or f"manual_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        backup_name = args.name or f"manual_backup_{args.started_at:%Y%m%d_%H%M%S}"
         success, result = database_manager.backup_database(backup_name)
         
         if success:
@@ -101,13 +216,19 @@ def cmd_backup(args):
 def cmd_migrate(args):
     """Run database migration with safety checks."""
     with setup_app_context():
+        database_manager = get_database_manager()
         print(f"Running migration: {args.direction}")
         
         if not args.skip_checks:
             print("Performing pre-migration safety checks...")
             
+            # The connection test and schema validation are independent
+            (conn_success, conn_error), (is_valid, issues) = run_concurrently(
+                database_manager.test_connection,
+                database_manager.validate_schema_integrity,
+            )
+            
             # Connection test
-            conn_success, conn_error = database_manager.test_connection()
             if not conn_success:
                 print(f"❌ Connection test failed: {conn_error}")
                 if not args.force:
@@ -117,7 +238,6 @@ def cmd_migrate(args):
                 print("✅ Connection test passed")
             
             # Schema validation
-            is_valid, issues = database_manager.validate_schema_integrity()
             if not is_valid and args.direction == "upgrade":
                 print("⚠️  Schema issues detected:")
                 for issue in issues:
@@ -131,6 +251,9 @@ def cmd_migrate(args):
         # Run migration
         success, message = database_manager.run_migration_safely(args.direction)
         
+        # The schema changed (or may have); don't serve cached reports
+        clear_report_cache()
+        
         if success:
             print(f"✅ Migration completed: {message}")
         else:
@@ -139,35 +262,87 @@ def cmd_migrate(args):
 
 def cmd_validate(args):
     """Validate database schema and integrity."""
-    with setup_app_context():
+    with introspection_context():
+        if args.json:
+            is_valid, issues = cached_schema_validation()
+            write_json({'valid': is_valid, 'issues': issues})
+            if not is_valid:
+                sys.exit(1)
+            return
+        
         print("Validating database schema and integrity...")
         
-        is_valid, issues = database_manager.validate_schema_integrity()
+        is_valid, issues = cached_schema_validation()
         
         if is_valid:
             print("✅ Database validation passed - no issues found")
         else:
-            print(f"❌ Database validation failed - {len(issues)} issues found:")
-            for i, issue in enumerate(issues, 1):
-                print(f"  {i}. {issue}")
+            # Indices right-aligned to the widest; written in one go
+            width = len(str(len(issues)))
+            lines = [f"❌ Database validation failed - {len(issues)} issues found:"]
+            lines += [f"  {i:>{width}}. {issue}" for i, issue in enumerate(issues, 1)]
+            sys.stdout.write("\n".join(lines) + "\n")
             sys.exit(1)
 
 def cmd_info(args):
     """Display detailed database information."""
-    with setup_app_context():
-        db_info = database_manager.get_database_info()
+    with introspection_context():
+        db_info = cached_database_info()
+        if args.json:
+            write_json(db_info)
+            return
         
-        print("=" * 60)
-        print("DETAILED DATABASE INFORMATION")
-        print("=" * 60)
+        lines = [
+            "=" * 60,
+            "DETAILED DATABASE INFORMATION",
+            "=" * 60,
+        ]
         
         for key, value in db_info.items():
             if isinstance(value, dict):
-                print(f"{key.replace('_', ' ').title()}:")
-                for sub_key, sub_value in value.items():
-                    print(f"  {sub_key}: {sub_value}")
+                lines.append(f"{key.replace('_', ' ').title()}:")
+                lines += [f"  {sub_key}: {sub_value}" for sub_key, sub_value in value.items()]
             else:
-                print(f"{key.replace('_', ' ').title()}: {value}")
+                lines.append(f"{key.replace('_', ' ').title()}: {value}")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
+
+def cmd_daemon(args):
+    """Run commands read from stdin, one per line, against one warm app."""
+    from extensions import db
+    with setup_app_context():
+        for line in sys.stdin:
+            try:
+                argv = shlex.split(line)
+                if not argv:
+                    continue
+                if argv == ['cache', 'clear']:
+                    clear_report_cache()
+                    continue
+                command_args = args.parser.parse_args(argv)
+                if command_args.command == 'daemon':
+                    print("Already running as daemon")
+                    continue
+                run_command(command_args)
+            except SystemExit:
+                # Failed commands and argparse errors end that command only
+                pass
+            except Exception as e:
+                logger.exception("Daemon command failed")
+                print(f"❌ Command failed: {str(e)}")
+            finally:
+                # Each command starts from a clean session, even after an error
+                db.session.remove()
+                sys.stdout.flush()
+
+def run_command(args):
+    """Dispatch parsed arguments to their command handler."""
+    # One clock read per command; reports and names derive from it
+    args.started_at = datetime.now()
+    if getattr(args, 'func', None) is None:
+        print(f"Unknown command: {args.command}")
+        sys.exit(1)
+    args.func(args)
 
 def main():
     """Main command line interface."""
@@ -180,13 +355,17 @@ def main():
     
     # Status command
     status_parser = subparsers.add_parser('status', help='Display database status')
+    status_parser.set_defaults(func=cmd_status)
+    status_parser.add_argument('--json', action='store_true', help='Output the report as JSON')
     
     # Backup command
     backup_parser = subparsers.add_parser('backup', help='Create database backup')
+    backup_parser.set_defaults(func=cmd_backup)
     backup_parser.add_argument('--name', help='Custom backup name')
     
     # Migration command
     migrate_parser = subparsers.add_parser('migrate', help='Run database migration')
+    migrate_parser.set_defaults(func=cmd_migrate)
     migrate_parser.add_argument('--direction', choices=['upgrade', 'downgrade'], 
                                default='upgrade', help='Migration direction')
     migrate_parser.add_argument('--skip-checks', action='store_true',
@@ -196,9 +375,17 @@ def main():
     
     # Validate command
     validate_parser = subparsers.add_parser('validate', help='Validate database schema')
+    validate_parser.set_defaults(func=cmd_validate)
+    validate_parser.add_argument('--json', action='store_true', help='Output the report as JSON')
     
     # Info command  
     info_parser = subparsers.add_parser('info', help='Display detailed database information')
+    info_parser.set_defaults(func=cmd_info)
+    info_parser.add_argument('--json', action='store_true', help='Output the report as JSON')
+    
+    # Daemon command
+    daemon_parser = subparsers.add_parser('daemon', help='Run commands read from stdin against one app instance')
+    daemon_parser.set_defaults(func=cmd_daemon, parser=parser)
     
     args = parser.parse_args()
     
@@ -207,19 +394,7 @@ def main():
         sys.exit(1)
     
     try:
-        if args.command == 'status':
-            cmd_status(args)
-        elif args.command == 'backup':
-            cmd_backup(args)
-        elif args.command == 'migrate':
-            cmd_migrate(args)
-        elif args.command == 'validate':
-            cmd_validate(args)
-        elif args.command == 'info':
-            cmd_info(args)
-        else:
-            print(f"Unknown command: {args.command}")
-            sys.exit(1)
+        run_command(args)
             
     except KeyboardInterrupt:
         print("\nOperation cancelled by user")
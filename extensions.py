@@ -0,0 +1,26 @@
+"""
+Flask extension singletons for PLS Travels
+Kept apart from app.py so models and blueprints can import them without
+importing the application module (and create_app) itself
+"""
+
+from flask_sqlalchemy import SQLAlchemy
+from flask_wtf.csrf import CSRFProtect
+from flask_jwt_extended import JWTManager
+from flask_login import LoginManager
+from flask_socketio import SocketIO
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
+login_manager = LoginManager()
+socketio = SocketIO()
+csrf = CSRFProtect()
+jwt = JWTManager()
+limiter = Limiter(key_func=get_remote_address)
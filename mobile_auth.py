@@ -3,13 +3,15 @@ Mobile Authentication Module
 JWT-based authentication for Android app integration
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session as flask_session
 from flask_jwt_extended import (
     JWTManager, jwt_required, create_access_token, 
     create_refresh_token, get_jwt_identity, get_jwt
 )
 from flask_login import login_user
+from sqlalchemy.orm import joinedload
 import logging
+import time
 from datetime import datetime, timezone, timedelta
 
 from utils.twilio_otp import (
@@ -30,6 +32,10 @@ def get_user_status_enum():
     from models import UserStatus
     return UserStatus
 
+def get_driver_model():
+    from models import Driver
+    return Driver
+
 def get_db():
     from models import db
     return db
@@ -119,7 +125,6 @@ def mobile_send_otp():
             }), 429
 
         # Record start time for consistent response timing
-        import time
         start_time = time.time()
 
         # Check if user exists with this phone number
@@ -138,7 +143,6 @@ def mobile_send_otp():
                 # Store OTP in session for mobile verification
                 # For mobile, we'll use a simple in-memory store or database
                 # This is a simplified version for mobile API
-                from flask import session as flask_session
                 OTPSession.store_otp(flask_session, formatted_phone, otp_code, 'mobile_login')
 
                 # Record successful send for rate limiting
@@ -212,9 +216,15 @@ def mobile_verify_otp():
         # For now, let's verify against the user database
         User = get_user_model()
         UserStatus = get_user_status_enum()
-        user = User.query.filter_by(phone=formatted_phone).first()
+        Driver = get_driver_model()
+        # The driver profile and its branch come back in the same query for
+        # the response below
+        user = (User.query
+                .options(joinedload(User.driver_profile).joinedload(Driver.branch))
+                .filter_by(phone=formatted_phone, status=UserStatus.ACTIVE)
+                .first())
 
-        if not user or user.status != UserStatus.ACTIVE:
+        if not user:
             logger.warning(f"MOBILE_OTP_VERIFY_INVALID_USER: Phone: {formatted_phone[-4:].rjust(4, '*')} "
                           f"IP: {client_ip}")
             return jsonify({
@@ -224,7 +234,6 @@ def mobile_verify_otp():
             }), 401
 
         # Verify OTP using proper session validation
-        from flask import session as flask_session
         otp_result = OTPSession.verify_otp(flask_session, otp_code)
         
         if not otp_result['success']:
@@ -275,12 +284,26 @@ def mobile_verify_otp():
             expires_delta=timedelta(days=30)  # 30 day refresh token
         )
 
+        # Users have no branch of their own; drivers belong to one
+        driver = user.driver_profile
+        branch_name = driver.branch.name if driver and driver.branch else None
+
+        # Read before the commit expires the instance
+        user_data = {
+            'id': user.id,
+            'username': user.username,
+            'role': user.role.name if user.role else 'UNKNOWN',
+            'full_name': user.full_name,
+            'phone': formatted_phone,
+            'branch_name': branch_name
+        }
+
         # Update user's last login
         db = get_db()
         user.last_login = datetime.now(timezone.utc)
         db.session.commit()
 
-        logger.info(f"MOBILE_LOGIN_SUCCESS: User: {user.username} "
+        logger.info(f"MOBILE_LOGIN_SUCCESS: User: {user_data['username']} "
                    f"Phone: {formatted_phone[-4:].rjust(4, '*')} IP: {client_ip}")
 
         return jsonify({
@@ -288,14 +311,7 @@ def mobile_verify_otp():
             'message': 'Authentication successful',
             'access_token': access_token,
             'refresh_token': refresh_token,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'role': user.role.name if user.role else 'UNKNOWN',
-                'full_name': user.full_name,
-                'phone': formatted_phone,
-                'branch_name': user.branch.name if user.branch else None
-            },
+            'user': user_data,
             'token_expires_in': 3600  # 1 hour in seconds
         })
 
@@ -2,7 +2,7 @@
 from datetime import datetime, date
 import json
 import pytz
-from app import db
+from extensions import db
 from flask_login import UserMixin
 from sqlalchemy import func, Index, CheckConstraint, UniqueConstraint
 from sqlalchemy.ext.hybrid import hybrid_property
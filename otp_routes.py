@@ -5,7 +5,9 @@ Handles phone number based OTP login and verification
 
 from flask import Blueprint, request, jsonify, session, render_template, redirect, url_for, flash
 from flask_login import login_user, current_user
+from sqlalchemy import func, select, update
 import logging
+import time
 from datetime import datetime, timezone, timedelta
 from app import csrf
 
@@ -26,6 +28,12 @@ logger = logging.getLogger(__name__)
 # Create OTP blueprint
 otp_bp = Blueprint('otp', __name__)
 
+# Dashboard endpoint per role; every other role lands on the driver dashboard
+_DASHBOARDS = {
+    UserRole.ADMIN: 'admin.dashboard',
+    UserRole.MANAGER: 'manager.dashboard',
+}
+
 def get_client_ip():
     """
     Securely extract client IP address from request headers.
@@ -110,7 +118,6 @@ def send_otp():
             }), 429
         
         # Record start time for consistent response timing
-        import time
         start_time = time.time()
         
         # Check if user exists with this phone number
@@ -218,25 +225,26 @@ def verify_otp():
                      f'{verification_result["message"]}, IP: {client_ip}')
             return jsonify(verification_result), 400
         
-        # Get user by phone number
+        # Get the active user by phone number
         phone_number = verification_result['phone']
-        user = User.query.filter_by(phone=phone_number).first()
+        user = User.query.filter_by(phone=phone_number, status=UserStatus.ACTIVE).first()
         
         if not user:
+            # Only the rejected path asks why, so the audit log still tells
+            # an inactive account apart from an unknown phone
+            status = db.session.scalar(select(User.status).where(User.phone == phone_number).limit(1))
+            if status is not None:
+                log_audit('verify_otp_inactive_user', phone_number, f'Status: {status.name}')
+                return jsonify({
+                    'success': False,
+                    'message': 'Account is not active'
+                }), 403
             log_audit('verify_otp_user_not_found', phone_number)
             return jsonify({
                 'success': False,
                 'message': 'User not found'
             }), 404
         
-        # Double-check user is still active
-        if user.status != UserStatus.ACTIVE:
-            log_audit('verify_otp_inactive_user', phone_number, f'Status: {user.status.name}')
-            return jsonify({
-                'success': False,
-                'message': 'Account is not active'
-            }), 403
-        
         # Record successful verification attempt
         otp_rate_limiter.record_verification_attempt(
             phone_number, client_ip, session_id, success=True
@@ -245,42 +253,41 @@ def verify_otp():
         # Log the user in
         login_user(user, remember=True)
         
-        # Update last login
-        user.last_login = get_ist_time_naive()
-        user.login_count = (user.login_count or 0) + 1
-        user.failed_login_attempts = 0
+        # Determine redirect URL based on user role
+        redirect_url = url_for(_DASHBOARDS.get(user.role, 'driver.dashboard'))
+        
+        # Read before the commit expires the instance
+        user_data = {
+            'username': user.username,
+            'role': user.role.name,
+            'full_name': user.full_name
+        }
+        log_audit('verify_otp_success', phone_number, f'User: {user.username}, IP: {client_ip}')
+        
+        # Update last login in one statement, the only write of this request
+        stmt = update(User).where(User.id == user.id).values(
+            last_login=get_ist_time_naive(),
+            login_count=func.coalesce(User.login_count, 0) + 1,
+            failed_login_attempts=0,
+        )
         
         # Commit with retry logic
         max_retries = 3
         for attempt in range(max_retries):
             try:
+                db.session.execute(stmt, execution_options={'synchronize_session': False})
                 db.session.commit()
                 break
             except Exception:
                 db.session.rollback()
                 if attempt < max_retries - 1:
-                    import time
                     time.sleep(0.5)
         
-        log_audit('verify_otp_success', phone_number, f'User: {user.username}, IP: {client_ip}')
-        
-        # Determine redirect URL based on user role
-        if user.role == UserRole.ADMIN:
-            redirect_url = url_for('admin.dashboard')
-        elif user.role == UserRole.MANAGER:
-            redirect_url = url_for('manager.dashboard')
-        else:
-            redirect_url = url_for('driver.dashboard')
-        
         return jsonify({
             'success': True,
             'message': 'Login successful',
             'redirect_url': redirect_url,
-            'user': {
-                'username': user.username,
-                'role': user.role.name,
-                'full_name': user.full_name
-            }
+            'user': user_data
         })
         
     except Exception as e:
@@ -375,12 +382,7 @@ def otp_login_page():
     """Show OTP login page"""
     if current_user.is_authenticated:
         # Redirect based on role
-        if current_user.role == UserRole.ADMIN:
-            return redirect(url_for('admin.dashboard'))
-        elif current_user.role == UserRole.MANAGER:
-            return redirect(url_for('manager.dashboard'))
-        else:
-            return redirect(url_for('driver.dashboard'))
+        return redirect(url_for(_DASHBOARDS.get(current_user.role, 'driver.dashboard')))
     
     return render_template('auth/otp_login.html')
 
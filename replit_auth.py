@@ -19,8 +19,7 @@ from sqlalchemy.exc import NoResultFound
 from werkzeug.local import LocalProxy
 
 from flask import current_app
-from models import OAuth, User, UserRole, UserStatus, AuditLog
-import json
+from models import OAuth, User, UserRole, UserStatus
 try:
     from jwt import PyJWKClient
 except ImportError:
@@ -59,19 +58,9 @@ def verify_jwt_token(token, issuer_url):
         return None
 
 def log_audit(action, entity_type=None, entity_id=None, details=None):
-    """Helper function to log audit events"""
-    if current_user.is_authenticated:
-        from app import db
-        audit = AuditLog()
-        audit.user_id = current_user.id
-        audit.action = action
-        audit.entity_type = entity_type
-        audit.entity_id = entity_id
-        audit.new_values = json.dumps(details) if details else None
-        audit.ip_address = request.remote_addr
-        audit.user_agent = request.headers.get('User-Agent', '')[:255]
-        db.session.add(audit)
-        db.session.commit()
+    """Helper function to log audit events; queued for auth's batched writer"""
+    from auth import log_audit as queue_audit
+    queue_audit(action, entity_type, entity_id, details)
 
 class UserSessionStorage(BaseStorage):
 
@@ -181,14 +170,14 @@ def save_user(user_claims):
     
     if not user:
         # Create new user
-        from werkzeug.security import generate_password_hash
+        from utils.security import hash_password
         user = User()
         user.username = user_claims.get('email', '').split('@')[0] or f"user_{user_claims['sub']}"
         user.email = user_claims.get('email')
         user.first_name = user_claims.get('first_name')
         user.last_name = user_claims.get('last_name')
         user.profile_picture = user_claims.get('profile_image_url')
-        user.password_hash = generate_password_hash('replit_oauth_user')  # Set dummy password
+        user.password_hash = hash_password('replit_oauth_user')  # Set dummy password
         user.role = UserRole.DRIVER  # Default role
         user.status = UserStatus.ACTIVE
         db.session.add(user)
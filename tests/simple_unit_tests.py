@@ -238,6 +238,26 @@ class TestBusinessLogic:
         final_earnings_high = max(high_earnings, minimum_guarantee)
         assert final_earnings_high == 600.0
 
+    def test_tripsheet_batch_matches_scalar(self):
+        """Test batch tripsheet results equal per-row results, types included"""
+        from utils_main import calculate_tripsheet, calculate_tripsheet_batch
+
+        rows = [
+            {'company_pay': 1000, 'cash_collected': 500, 'operator_bill': 800, 'advance': 100},
+            {'company_pay': 1000.5, 'cash_collected': 900.25, 'operator_bill': 800, 'toll': 45.75},
+            {'company_pay': 750, 'cash_collected': 300.0, 'operator_bill': 450, 'qr_payment': 120},
+        ]
+        batch = calculate_tripsheet_batch(rows)
+        expected = [calculate_tripsheet(row) for row in rows]
+
+        assert batch == expected
+        for batch_row, expected_row in zip(batch, expected):
+            assert {k: type(v) for k, v in batch_row.items()} == {k: type(v) for k, v in expected_row.items()}
+
+        # Numeric strings are rejected the same way as by the scalar path
+        with pytest.raises(TypeError):
+            calculate_tripsheet_batch([{'company_pay': '100'}] * 3)
+
 
 class TestSecurityHelpers:
     """Test security-related helper functions"""
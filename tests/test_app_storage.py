@@ -0,0 +1,140 @@
+"""
+AppStorageManager tests: saves, queries and deletes through the metadata index
+"""
+
+import base64
+import io
+import os
+import sys
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_storage import AppStorageManager  # noqa: E402
+
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+@pytest.fixture
+def storage(tmp_path):
+    manager = AppStorageManager(base_path=str(tmp_path / 'storage'))
+    yield manager
+    manager._sidecar_writer.shutdown(wait=True)
+
+
+def upload(storage, user_id, file_type='aadhar', name='card.png'):
+    file = FileStorage(stream=io.BytesIO(PNG_BYTES), filename=name, content_type='image/png')
+    return storage.save_uploaded_file(file, user_id, file_type)
+
+
+def wait_for_sidecars(storage):
+    """Block until the background sidecar writes submitted so far are done"""
+    storage._sidecar_writer.submit(lambda: None).result()
+
+
+class TestStorageIndex:
+    """Metadata queries are answered by the SQLite index"""
+
+    def test_save_and_query(self, storage):
+        """Test saved files are found by name, user and category"""
+        saved = upload(storage, 7)
+        other = upload(storage, 8, 'license', 'licence.jpg')
+
+        assert saved['file_size'] == len(PNG_BYTES)
+        assert (storage.base_path / saved['file_path']).read_bytes() == PNG_BYTES
+        assert storage.get_file_metadata(saved['stored_filename'], 'documents') == saved
+
+        assert storage.get_user_files(7) == [saved]
+        assert storage.get_user_files(8, file_type='aadhar') == []
+        assert storage.get_user_files(8, file_type='license') == [other]
+
+        page = storage.get_files_by_category('documents', per_page=1)
+        assert page['total'] == 2
+        assert page['pages'] == 2
+        assert len(page['files']) == 1
+        assert storage.get_files_by_category('documents', user_filter=8)['files'] == [other]
+
+        stats = storage.get_storage_stats()
+        assert stats['total_files'] == 2
+        assert stats['categories']['documents']['size'] == 2 * len(PNG_BYTES)
+
+    def test_deleted_directory_is_recreated(self, storage):
+        """Test a storage directory removed after setup comes back on the next start"""
+        folder = storage.get_storage_path('documents', 'aadhar')
+        (folder / '.gitkeep').unlink()
+        folder.rmdir()
+
+        restarted = AppStorageManager(base_path=str(storage.base_path))
+        try:
+            assert folder.is_dir()
+            assert upload(restarted, 7) is not None
+        finally:
+            restarted._sidecar_writer.shutdown(wait=True)
+
+    def test_rejects_disallowed_extension(self, storage):
+        """Test files outside the category's extensions are not stored"""
+        assert upload(storage, 7, name='payload.exe') is None
+        assert storage.get_user_files(7) == []
+
+    def test_camera_capture(self, storage):
+        """Test captures decode base64 payloads, line breaks included"""
+        encoded = base64.b64encode(PNG_BYTES).decode()
+        image_data = 'data:image/png;base64,' + encoded[:40] + '\r\n' + encoded[40:]
+
+        saved = storage.save_camera_capture(image_data, 7, 'camera_aadhar', {'latitude': 12.97})
+
+        assert saved['image_format'] == 'png'
+        assert saved['latitude'] == 12.97
+        assert (storage.base_path / saved['file_path']).read_bytes() == PNG_BYTES
+        assert storage.get_file_metadata(saved['stored_filename'], 'captures') == saved
+        assert storage.save_camera_capture('not a data uri', 7, 'camera_aadhar') is None
+
+    def test_delete(self, storage):
+        """Test deleting removes the file, its index row and its sidecar"""
+        saved = upload(storage, 7)
+        filename = saved['stored_filename']
+        wait_for_sidecars(storage)
+        assert storage._sidecar_path(filename, 'documents').exists()
+
+        assert storage.delete_file(filename, 'documents') is True
+        wait_for_sidecars(storage)
+
+        assert not (storage.base_path / saved['file_path']).exists()
+        assert not storage._sidecar_path(filename, 'documents').exists()
+        assert storage.get_file_metadata(filename, 'documents') is None
+        assert storage.get_user_files(7) == []
+        assert storage.get_storage_stats()['total_files'] == 0
+
+    def test_delete_ignores_paths_outside_storage(self, storage, tmp_path):
+        """Test an indexed path pointing outside the storage root is not followed"""
+        saved = upload(storage, 7)
+        outside = tmp_path / saved['stored_filename']
+        outside.write_bytes(b'keep me')
+        storage.save_metadata(saved['stored_filename'], dict(saved, file_path=str(outside)), 'documents')
+
+        assert storage.delete_file(saved['stored_filename'], 'documents') is True
+
+        assert outside.read_bytes() == b'keep me'
+        assert not (storage.base_path / saved['file_path']).exists()
+
+    def test_rebuild_index_from_sidecars(self, storage):
+        """Test a missing index is refilled from the metadata sidecars"""
+        saved = upload(storage, 7)
+        capture = storage.save_camera_capture(
+            'data:image/jpeg;base64,' + base64.b64encode(b'jpeg').decode(), 7, 'camera_profile')
+        wait_for_sidecars(storage)
+        storage.index.close()
+        for suffix in ('', '-wal', '-shm'):
+            storage.index_path.with_name(storage.index_path.name + suffix).unlink(missing_ok=True)
+
+        rebuilt = AppStorageManager(base_path=str(storage.base_path))
+        try:
+            assert rebuilt.get_file_metadata(saved['stored_filename'], 'documents') == saved
+            assert rebuilt.get_file_metadata(capture['stored_filename'], 'captures') == capture
+            assert len(rebuilt.get_user_files(7)) == 2
+            assert rebuilt.get_storage_stats()['total_files'] == 2
+        finally:
+            rebuilt._sidecar_writer.shutdown(wait=True)
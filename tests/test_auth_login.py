@@ -0,0 +1,205 @@
+"""
+Login and registration tests against the Flask test client (in-memory SQLite)
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set test environment
+os.environ.update({
+    'FLASK_ENV': 'testing',
+    'TESTING': 'true',
+    'DATABASE_URL': 'sqlite:///:memory:',  # Force SQLite for tests
+    'SESSION_SECRET': 'test_secret_key_at_least_16_chars_long',
+    'JWT_SECRET_KEY': 'test_jwt_secret'
+})
+
+from app import app as flask_app, limiter  # noqa: E402
+import auth  # noqa: E402
+from auth import _create_user  # noqa: E402
+from models import db, User, UserRole, UserStatus  # noqa: E402
+from utils.security import hash_password  # noqa: E402
+
+PASSWORD = 'correct-horse-battery'
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        limiter.reset()
+        yield flask_app
+        db.session.remove()
+
+
+def make_user(password_hash=None, **values):
+    name = f"user_{uuid.uuid4().hex[:8]}"
+    user = User(
+        username=values.pop('username', name),
+        email=values.pop('email', f"{name}@example.com"),
+        password_hash=password_hash or hash_password(PASSWORD),
+        role=values.pop('role', UserRole.ADMIN),
+        status=values.pop('status', UserStatus.ACTIVE),
+        **values
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def login(app, username, password, ip='10.0.0.1'):
+    client = app.test_client()
+    return client.post('/auth/login', data={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+class TestLoginRateLimit:
+    """Failed-login throttling must not lock the account owner out"""
+
+    def test_owner_can_log_in_while_username_is_sprayed(self, app):
+        """Test that wrong passwords from one client don't block another"""
+        user = make_user()
+
+        for _ in range(5):
+            assert login(app, user.username, 'wrong-password', ip='203.0.113.9').status_code == 200
+        # The spraying client is now throttled for this account by the
+        # failure limit, before the per-IP request limit is reached
+        response = login(app, user.username, 'wrong-password', ip='203.0.113.9')
+        assert response.status_code == 429
+        assert b'Too many failed attempts' in response.data
+
+        response = login(app, user.username, PASSWORD, ip='198.51.100.7')
+        assert response.status_code == 302
+
+    def test_failures_on_other_accounts_are_counted_separately(self, app):
+        """Test the failure limit is per account, not only per client"""
+        user = make_user()
+        other = make_user()
+
+        for _ in range(5):
+            login(app, other.username, 'wrong-password', ip='203.0.113.9')
+
+        response = login(app, user.username, PASSWORD, ip='203.0.113.9')
+        assert response.status_code == 302
+
+
+class TestLogin:
+    """Password login, including the upgrade of legacy password hashes"""
+
+    def test_success(self, app):
+        """Test a correct password logs in and records the login"""
+        user = make_user()
+
+        response = login(app, user.username, PASSWORD)
+
+        assert response.status_code == 302
+        db.session.refresh(user)
+        assert user.login_count == 1
+        assert user.last_login is not None
+        assert user.failed_login_attempts == 0
+
+    def test_failure(self, app):
+        """Test a wrong password re-renders the form and counts the failure"""
+        user = make_user()
+
+        response = login(app, user.username, 'wrong-password')
+
+        assert response.status_code == 200
+        assert b'Invalid username or password.' in response.data
+        db.session.refresh(user)
+        assert user.failed_login_attempts == 1
+        assert not user.login_count
+
+    def test_unknown_and_inactive_users_are_rejected(self, app):
+        """Test only active accounts can log in"""
+        user = make_user(status=UserStatus.SUSPENDED)
+
+        assert login(app, user.username, PASSWORD).status_code == 200
+        assert login(app, 'no-such-user', PASSWORD).status_code == 200
+
+    def test_legacy_hash_is_upgraded(self, app):
+        """Test a werkzeug PBKDF2 hash is replaced by Argon2id on login"""
+        user = make_user(password_hash=generate_password_hash(PASSWORD, method='pbkdf2:sha256'))
+
+        assert login(app, user.username, PASSWORD).status_code == 302
+
+        db.session.refresh(user)
+        assert user.password_hash.startswith('$argon2id$')
+        # The upgraded hash still accepts the password
+        db.session.expunge(user)
+        assert login(app, user.username, PASSWORD, ip='10.0.0.2').status_code == 302
+
+
+class TestRegister:
+    """Registration refuses a username or email that is already taken"""
+
+    def register(self, app, username, email):
+        return app.test_client().post('/auth/register', data={
+            'username': username,
+            'email': email,
+            'password': PASSWORD,
+            'password2': PASSWORD,
+            'role': 'manager',
+        })
+
+    def test_new_user(self, app):
+        """Test a free username and email create the account"""
+        name = f"new_{uuid.uuid4().hex[:8]}"
+
+        response = self.register(app, name, f"{name}@example.com")
+
+        assert response.status_code == 302
+        user = User.query.filter_by(username=name).one()
+        assert user.role == UserRole.MANAGER
+
+    @pytest.mark.parametrize('taken', ['username', 'email'])
+    def test_duplicate(self, app, taken):
+        """Test a taken username or email re-renders the form without a new user"""
+        existing = make_user()
+        name = f"new_{uuid.uuid4().hex[:8]}"
+        username = existing.username if taken == 'username' else name
+        email = existing.email if taken == 'email' else f"{name}@example.com"
+        count = User.query.count()
+
+        response = self.register(app, username, email)
+
+        assert response.status_code == 200
+        assert b'Username or email already exists.' in response.data
+        assert User.query.count() == count
+
+    def test_other_unique_violation_is_not_reported_as_taken(self, app):
+        """Test only a username or email clash counts as an existing user"""
+        existing = make_user()
+        name = f"new_{uuid.uuid4().hex[:8]}"
+
+        with pytest.raises(IntegrityError):
+            _create_user({'username': name, 'email': f"{name}@example.com", 'uuid': existing.uuid,
+                          'password_hash': '', 'role': UserRole.MANAGER})
+        db.session.rollback()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+class TestAuditFlusher:
+    """Audit rows are written by a per-process background thread"""
+
+    def test_forked_worker_starts_its_own_flusher(self, app):
+        """Test a child forked after the first audit write gets a live flusher"""
+        auth._start_audit_flusher(app)
+        assert auth._audit_flusher.is_alive()
+
+        pid = os.fork()
+        if pid == 0:
+            ok = auth._audit_flusher is None
+            auth._start_audit_flusher(app)
+            ok = ok and auth._audit_flusher.is_alive()
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
@@ -1,7 +1,30 @@
-from datetime import datetime
-import pytz
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    IST = ZoneInfo('Asia/Kolkata')
+except ZoneInfoNotFoundError:
+    # No system tz database (and no tzdata package); IST has no DST
+    IST = timezone(timedelta(hours=5, minutes=30), 'IST')
+UTC = timezone.utc
 
 def get_ist_time_naive():
     """Get current IST time as naive datetime for database storage"""
-    ist = pytz.timezone('Asia/Kolkata')
-    return datetime.now(ist).replace(tzinfo=None)
\ No newline at end of file
+    return datetime.now(IST).replace(tzinfo=None)
+
+def get_ist_time():
+    """Get current time in IST timezone"""
+    return datetime.now(IST)
+
+# Templates convert the same timestamps repeatedly within a render; datetimes
+# are immutable and hashable (aware values hash by instant), so memoize
+@lru_cache(maxsize=2048)
+def convert_to_ist(dt):
+    """Convert datetime to IST timezone"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        # Assume UTC if no timezone info
+        dt = dt.replace(tzinfo=UTC)
+    return dt.astimezone(IST)
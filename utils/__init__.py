@@ -1,6 +1,7 @@
 # Utils package - import utility functions from main utils module
 import os
 import sys
+import logging
 
 # Add parent directory to path to import utils_main
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -9,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 try:
     from utils_main import (
         calculate_tripsheet, 
+        calculate_tripsheet_batch,
         SalaryCalculator, 
         DutyEntry,
         calculate_earnings,
@@ -28,9 +30,9 @@ try:
         STORAGE_BUCKETS,
         ALLOWED_EXTENSIONS
     )
-    print("Successfully imported functions from utils_main")
+    logging.getLogger(__name__).debug("Successfully imported functions from utils_main")
 except ImportError as e:
-    print(f"Failed to import from utils_main: {e}")
+    logging.getLogger(__name__).error(f"Failed to import from utils_main: {e}")
 
 # Also keep local functions for compatibility
 def generate_employee_id():
@@ -0,0 +1,223 @@
+"""
+Response compression for PLS Travels
+Compresses text/JSON responses with the best encoding the client accepts
+(zstd, Brotli or gzip)
+"""
+
+import os
+import gzip
+import logging
+import mimetypes
+import threading
+from typing import Callable, Dict, Optional
+from flask import Flask, Response, abort, request
+from werkzeug.security import safe_join
+
+# Optional encoders; gzip is always available
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+# text/html is left out: pages carry the CSRF token next to reflected
+# input, and compressing that leaks the token (BREACH)
+DEFAULT_COMPRESS_MIMETYPES = {
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+}
+
+# Server preference when the client accepts several encodings
+DEFAULT_COMPRESS_ALGORITHM = ['zstd', 'br', 'gzip']
+
+# ZstdCompressor instances must not be shared between threads
+_zstd_local = threading.local()
+
+
+def _zstd_compress(data: bytes, level: int) -> bytes:
+    compressor = getattr(_zstd_local, 'compressor', None)
+    if compressor is None or _zstd_local.level != level:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=level)
+        _zstd_local.level = level
+    return compressor.compress(data)
+
+
+def _available_encoders(app: Flask) -> Dict[str, Callable[[bytes], bytes]]:
+    """Encoders enabled by COMPRESS_ALGORITHM and installed, in preference order"""
+    gzip_level = app.config['COMPRESS_LEVEL']
+    br_level = app.config['COMPRESS_BR_LEVEL']
+    zstd_level = app.config['COMPRESS_ZSTD_LEVEL']
+
+    encoders = {
+        'gzip': lambda data: gzip.compress(data, compresslevel=gzip_level),
+    }
+    if BROTLI_AVAILABLE:
+        encoders['br'] = lambda data: brotli.compress(data, quality=br_level)
+    if ZSTD_AVAILABLE:
+        encoders['zstd'] = lambda data: _zstd_compress(data, zstd_level)
+
+    return {name: encoders[name] for name in app.config['COMPRESS_ALGORITHM'] if name in encoders}
+
+
+def negotiate_encoding(encodings) -> Optional[str]:
+    """First of the given encodings the current request accepts"""
+    accepted = request.accept_encodings
+    for name in encodings:
+        if accepted[name] > 0:
+            return name
+    return None
+
+
+def setup_compression(app: Flask):
+    """Set up compression of eligible responses. Off unless COMPRESS_ENABLED
+    is set: it adds CPU to every response and is normally the front proxy's job"""
+
+    # Low levels give most of the size reduction at a fraction of the CPU;
+    # tiny bodies aren't worth the added latency
+    app.config.setdefault('COMPRESS_ENABLED', os.environ.get('COMPRESS_ENABLED', 'false').lower() == 'true')
+    app.config.setdefault('COMPRESS_LEVEL', int(os.environ.get('COMPRESS_LEVEL', '1')))
+    app.config.setdefault('COMPRESS_BR_LEVEL', int(os.environ.get('COMPRESS_BR_LEVEL', '4')))
+    app.config.setdefault('COMPRESS_ZSTD_LEVEL', int(os.environ.get('COMPRESS_ZSTD_LEVEL', '3')))
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', '1024')))
+    app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_COMPRESS_MIMETYPES)
+    app.config.setdefault('COMPRESS_ALGORITHM', DEFAULT_COMPRESS_ALGORITHM)
+
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    encoders = _available_encoders(app)
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    compress_mimetypes = frozenset(app.config['COMPRESS_MIMETYPES'])
+    logger.info(f"Response compression enabled: {', '.join(encoders)}")
+
+    @app.after_request
+    def compress_response(response):
+        """Encode the response body when the client and content allow it"""
+        if (response.direct_passthrough
+                or response.is_streamed
+                or response.status_code < 200
+                or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in compress_mimetypes):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(encoders)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(encoders[encoding](data))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The encoded bytes differ from the identity representation
+            response.set_etag(etag, weak=True)
+        return response
+
+
+# Text assets worth keeping pre-encoded; images and uploads are already compressed
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.txt', '.svg', '.json', '.xml', '.html'}
+
+
+class PrecompressedFileCache:
+    """
+    Keeps every supported encoding of small static text files in memory.
+    Each file is encoded once per version (mtime/size) at maximum levels,
+    so serving it costs no compression CPU.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode_all(data: bytes) -> Dict[str, bytes]:
+        bodies = {'identity': data, 'gzip': gzip.compress(data, compresslevel=9)}
+        if BROTLI_AVAILABLE:
+            bodies['br'] = brotli.compress(data, quality=11)
+        if ZSTD_AVAILABLE:
+            bodies['zstd'] = zstandard.ZstdCompressor(level=19).compress(data)
+        # Only keep encodings that actually save bytes
+        return {name: body for name, body in bodies.items() if name == 'identity' or len(body) < len(data)}
+
+    def warm(self, directory: str) -> int:
+        """Encode every eligible file under directory now, so no request
+        waits for the slow maximum-level encoders; returns the file count"""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in PRECOMPRESS_EXTENSIONS:
+                    try:
+                        self.get(os.path.join(root, name))
+                    except OSError as e:
+                        logger.warning(f"Could not precompress {name}: {e}")
+                        continue
+                    count += 1
+        return count
+
+    def get(self, path: str) -> Dict:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry['version'] == version:
+            return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        entry = {
+            'version': version,
+            'etag': f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            'bodies': self._encode_all(data),
+        }
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+
+precompressed_files = PrecompressedFileCache()
+
+
+def send_precompressed(directory: str, filename: str, max_age: Optional[int] = None):
+    """Serve a static text file from the precompressed cache, choosing the
+    encoding from Accept-Encoding; honours If-None-Match"""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    entry = precompressed_files.get(path)
+    bodies = entry['bodies']
+    encoding = negotiate_encoding([name for name in DEFAULT_COMPRESS_ALGORITHM if name in bodies]) or 'identity'
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = Response(bodies[encoding], mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(f"{entry['etag']}-{encoding}")
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
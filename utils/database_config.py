@@ -0,0 +1,67 @@
+"""
+Database URL and engine settings shared by the web app and the CLI
+"""
+import functools
+import os
+
+# Optional psycopg 3 driver (preferred over psycopg2 when installed)
+try:
+    import psycopg  # noqa: F401
+    PSYCOPG3_AVAILABLE = True
+except ImportError:
+    PSYCOPG3_AVAILABLE = False
+
+@functools.lru_cache(maxsize=8)
+def resolve_database_url(raw_url):
+    """Normalize DATABASE_URL: default to the dev SQLite file and pin
+    Postgres URLs (postgres:// or postgresql://) to a driver: psycopg 3 when
+    installed (server-side prepared statements), else psycopg2"""
+    database_url = raw_url or "sqlite:///instance/pls_travels_dev.db"
+    driver = "psycopg" if PSYCOPG3_AVAILABLE else "psycopg2"
+    for scheme in ("postgresql://", "postgres://"):
+        if database_url.startswith(scheme):
+            return f"postgresql+{driver}://" + database_url[len(scheme):]
+    return database_url
+
+def default_pool_limits():
+    """Per-worker (pool_size, max_overflow) that keep all workers together
+    within DB_CONNECTION_BUDGET (default 30) connections"""
+    workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "2")))
+    share = max(2, int(os.environ.get("DB_CONNECTION_BUDGET", "30")) // workers)
+    pool_size = max(1, share // 3)
+    return pool_size, share - pool_size
+
+def database_engine_options(database_url):
+    """SQLAlchemy engine options for a URL from resolve_database_url"""
+    if not database_url.startswith("postgresql+"):
+        # SQLite for local development. Connections are still pinged on
+        # checkout, replacing the old per-request SELECT 1.
+        return {
+            "pool_recycle": 300,
+            "pool_pre_ping": True,
+        }
+
+    # Total backend connections = workers x (pool_size + max_overflow); the
+    # defaults split DB_CONNECTION_BUDGET across WEB_CONCURRENCY workers
+    default_pool_size, default_max_overflow = default_pool_limits()
+    options = {
+        "pool_size": int(os.environ.get("SQLALCHEMY_POOL_SIZE", default_pool_size)),
+        "max_overflow": int(os.environ.get("SQLALCHEMY_MAX_OVERFLOW", default_max_overflow)),
+        "pool_recycle": int(os.environ.get("SQLALCHEMY_POOL_RECYCLE", "280")),
+        "pool_timeout": int(os.environ.get("SQLALCHEMY_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": True,
+        "connect_args": {
+            "sslmode": "require" if (os.environ.get('FLASK_ENV') == 'production' or os.environ.get('REPL_DEPLOYMENT') == 'true') else "prefer",
+            "connect_timeout": 30,
+            "application_name": "pls_travels"
+        }
+    }
+    if database_url.startswith("postgresql+psycopg://"):
+        # Prepare statements server-side after N executions so hot queries
+        # skip parse/plan; PG_PREPARE_THRESHOLD=none disables (e.g. behind
+        # a transaction-mode pooler without prepared statement support)
+        prepare_threshold = os.environ.get("PG_PREPARE_THRESHOLD", "5")
+        options["connect_args"]["prepare_threshold"] = (
+            None if prepare_threshold.lower() == "none" else int(prepare_threshold)
+        )
+    return options
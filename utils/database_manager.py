@@ -12,16 +12,22 @@ This module provides comprehensive database management functionality including:
 import os
 import logging
 import json
+import sqlite3
 import subprocess
 from datetime import datetime
 from typing import Optional, Dict, Any, List, Tuple
-from flask import current_app
+from flask import current_app, has_app_context
 from sqlalchemy import text, inspect, MetaData
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError
-from app import db
+from extensions import db
 
 logger = logging.getLogger(__name__)
 
+# SQLite online backups copy this many pages per step, releasing the
+# database lock in between so the app's writers aren't held off for the
+# whole copy
+SQLITE_BACKUP_PAGES = 1024
+
 class DatabaseManager:
     """
     Comprehensive database management system for production-safe operations.
@@ -30,6 +36,27 @@ class DatabaseManager:
     def __init__(self):
         self.backup_dir = "database_backups"
         os.makedirs(self.backup_dir, exist_ok=True)
+        self._engine = None
+    
+    def attach_engine(self, engine):
+        """
+        Use a plain SQLAlchemy engine instead of the Flask app's, so
+        read-only checks can run without building the application.
+        
+        Args:
+            engine: Engine to use, or None to go back to db.engine
+        """
+        self._engine = engine
+    
+    @property
+    def engine(self):
+        return self._engine if self._engine is not None else db.engine
+    
+    def _pool_stat(self, name: str) -> Any:
+        """Value of a QueuePool counter such as size() or checkedout(); 'N/A'
+        for pools (e.g. SQLite's) that don't keep it"""
+        stat = getattr(self.engine.pool, name, None)
+        return stat() if callable(stat) else 'N/A'
     
     def test_connection(self) -> Tuple[bool, Optional[str]]:
         """
@@ -39,7 +66,7 @@ class DatabaseManager:
             Tuple[bool, Optional[str]]: (success, error_message)
         """
         try:
-            with db.engine.connect() as conn:
+            with self.engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
             logger.info("Database connection test: SUCCESS")
             return True, None
@@ -56,22 +83,24 @@ class DatabaseManager:
             Dict[str, Any]: Database information including version, size, connections
         """
         try:
-            from flask import current_app
-            effective_db_url = current_app.config.get('SQLALCHEMY_DATABASE_URI', 'Unknown')
+            if has_app_context():
+                effective_db_url = current_app.config.get('SQLALCHEMY_DATABASE_URI', 'Unknown')
+            else:
+                effective_db_url = str(self.engine.url)
             
             info = {
                 'connection_successful': False,
                 'database_url_configured': bool(os.environ.get('DATABASE_URL')),
                 'effective_database_url': str(effective_db_url).split('@')[0] + '@***' if '@' in str(effective_db_url) else str(effective_db_url),
-                'engine_info': str(db.engine.url).split('@')[0] + '@***',  # Hide credentials
-                'pool_size': getattr(db.engine.pool, 'size', 'N/A'),
-                'checked_out_connections': getattr(db.engine.pool, 'checkedout', 'N/A'),
+                'engine_info': str(self.engine.url).split('@')[0] + '@***',  # Hide credentials
+                'pool_size': self._pool_stat('size'),
+                'checked_out_connections': self._pool_stat('checkedout'),
                 'timestamp': datetime.utcnow().isoformat()
             }
             
-            with db.engine.connect() as conn:
+            with self.engine.connect() as conn:
                 # Database-specific queries
-                database_url = str(db.engine.url)
+                database_url = str(self.engine.url)
                 
                 if 'postgresql' in database_url:
                     # PostgreSQL specific info
@@ -106,7 +135,7 @@ class DatabaseManager:
                     info['active_connections'] = 1  # SQLite single connection
                 
                 # Count tables and records
-                inspector = inspect(db.engine)
+                inspector = inspect(self.engine)
                 tables = inspector.get_table_names()
                 info['table_count'] = len(tables)
                 
@@ -141,7 +170,7 @@ class DatabaseManager:
         issues = []
         
         try:
-            inspector = inspect(db.engine)
+            inspector = inspect(self.engine)
             tables = inspector.get_table_names()
             
             # Required tables check
@@ -155,8 +184,8 @@ class DatabaseManager:
                     issues.append(f"Missing required table: {table}")
             
             # Check foreign key constraints
-            with db.engine.connect() as conn:
-                database_url = str(db.engine.url)
+            with self.engine.connect() as conn:
+                database_url = str(self.engine.url)
                 
                 if 'postgresql' in database_url:
                     # PostgreSQL constraint validation
@@ -220,7 +249,7 @@ class DatabaseManager:
             if not backup_name:
                 backup_name = f"backup_{timestamp}"
             
-            database_url = str(db.engine.url)
+            database_url = str(self.engine.url)
             
             if 'postgresql' in database_url:
                 # PostgreSQL backup using pg_dump
@@ -260,8 +289,15 @@ class DatabaseManager:
                 backup_file = os.path.join(self.backup_dir, f"{backup_name}.db")
                 
                 if os.path.exists(source_path):
-                    import shutil
-                    shutil.copy2(source_path, backup_file)
+                    # Online backup API: a consistent copy (including pages
+                    # still in the WAL) taken in short steps
+                    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+                    target = sqlite3.connect(backup_file)
+                    try:
+                        source.backup(target, pages=SQLITE_BACKUP_PAGES)
+                    finally:
+                        target.close()
+                        source.close()
                     logger.info(f"SQLite backup created: {backup_file}")
                     return True, backup_file
                 else:
@@ -0,0 +1,59 @@
+"""
+orjson-backed JSON provider for PLS Travels
+Serializes jsonify/tojson output in C while keeping the default provider's
+output: sorted keys, HTTP-date datetimes and the same fallbacks for
+Decimal, UUID, dataclasses and __html__ objects
+"""
+
+from typing import Any, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Drop-in replacement for DefaultJSONProvider using orjson"""
+
+    def _dumpb(self, obj: Any, default, indent: Optional[int], sort_keys: bool) -> bytes:
+        # Datetimes go through default() so they keep Flask's HTTP-date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        default = kwargs.pop('default', self.default)
+        indent = kwargs.pop('indent', None)
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        # orjson output is always compact UTF-8
+        kwargs.pop('separators', None)
+        kwargs.pop('ensure_ascii', None)
+        if not kwargs:
+            try:
+                return self._dumpb(obj, default, indent, sort_keys).decode()
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers beyond 64 bits; json can still encode them
+        return super().dumps(obj, default=default, indent=indent, sort_keys=sort_keys, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Like DefaultJSONProvider.response, encoding straight to bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        try:
+            body = self._dumpb(obj, self.default, indent, self.sort_keys)
+        except orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -226,6 +226,11 @@ def setup_logging(app=None) -> Dict[str, logging.Logger]:
         logging.getLogger('werkzeug').setLevel(logging.WARNING)
         logging.getLogger('urllib3').setLevel(logging.WARNING)
         logging.getLogger('requests').setLevel(logging.WARNING)
+    
+    # SQL statement logging formats every query; opt in with SQL_ECHO=1
+    if os.environ.get('SQL_ECHO', '0').lower() in ('1', 'true'):
+        logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
+    else:
         logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
     
     if app:
@@ -389,7 +389,7 @@ def setup_monitoring(app: Flask):
         return response
     
     # Health check endpoint
-    @app.route('/health')
+    @app.route('/health/detailed')
     def health_check():
         """Comprehensive health check endpoint"""
         return health_checker.run_all_checks()
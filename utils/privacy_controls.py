@@ -37,15 +37,42 @@ class LocationPrivacyValidator:
         Validate location data for accuracy and privacy compliance
         Returns: (is_valid, reason)
         """
+        is_valid, reason, is_mocked = cls._validate_coordinates(
+            location_data.get('latitude', 0),
+            location_data.get('longitude', 0),
+            location_data.get('accuracy'),
+            location_data.get('speed')
+        )
+        if is_mocked:
+            location_data['is_mocked'] = True
+        return is_valid, reason
+    
+    @classmethod
+    def validate_location_point(cls, point) -> Tuple[bool, str]:
+        """
+        Validate a decoded LocationPoint (attribute access variant)
+        Returns: (is_valid, reason)
+        """
+        is_valid, reason, is_mocked = cls._validate_coordinates(
+            point.latitude, point.longitude, point.accuracy, point.speed
+        )
+        if is_mocked:
+            point.is_mocked = True
+        return is_valid, reason
+    
+    @classmethod
+    def _validate_coordinates(cls, latitude, longitude, accuracy, speed) -> Tuple[bool, str, bool]:
+        """
+        Shared accuracy/privacy checks
+        Returns: (is_valid, reason, is_mocked)
+        """
         try:
-            lat = float(location_data.get('latitude', 0))
-            lon = float(location_data.get('longitude', 0))
-            accuracy = location_data.get('accuracy')
-            speed = location_data.get('speed')
+            lat = float(latitude)
+            lon = float(longitude)
             
             # Basic coordinate validation
             if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                return False, "Invalid coordinate ranges"
+                return False, "Invalid coordinate ranges", False
             
             # Geographic bounds check (India region)
             if not (cls.INDIA_LAT_BOUNDS[0] <= lat <= cls.INDIA_LAT_BOUNDS[1] and
@@ -59,7 +86,7 @@ class LocationPrivacyValidator:
             # Accuracy validation
             if accuracy is not None:
                 if float(accuracy) > cls.MAX_ACCURACY_METERS:
-                    return False, f"Location accuracy too low: {accuracy}m (max: {cls.MAX_ACCURACY_METERS}m)"
+                    return False, f"Location accuracy too low: {accuracy}m (max: {cls.MAX_ACCURACY_METERS}m)", False
                 
                 if float(accuracy) > cls.SUSPICIOUS_ACCURACY_METERS:
                     logger.warning(f"Suspicious location accuracy: {accuracy}m")
@@ -68,21 +95,21 @@ class LocationPrivacyValidator:
             if speed is not None:
                 speed_kmh = float(speed)
                 if speed_kmh > cls.MAX_REASONABLE_SPEED:
-                    return False, f"Unreasonable speed: {speed_kmh} km/h (max: {cls.MAX_REASONABLE_SPEED})"
+                    return False, f"Unreasonable speed: {speed_kmh} km/h (max: {cls.MAX_REASONABLE_SPEED})", False
                 
                 if speed_kmh > cls.SUSPICIOUS_SPEED:
                     logger.warning(f"High speed detected: {speed_kmh} km/h")
             
             # Check for obvious mocked locations
-            if cls._is_likely_mocked_location(lat, lon, accuracy, speed):
+            is_mocked = cls._is_likely_mocked_location(lat, lon, accuracy, speed)
+            if is_mocked:
                 # Log without exposing precise coordinates for privacy
                 logger.warning(f"Potentially mocked location detected (coordinates redacted)")
-                location_data['is_mocked'] = True
             
-            return True, "Valid"
+            return True, "Valid", is_mocked
             
         except (ValueError, TypeError) as e:
-            return False, f"Invalid location data format: {str(e)}"
+            return False, f"Invalid location data format: {str(e)}", False
     
     @classmethod
     def _is_likely_mocked_location(cls, lat: float, lon: float, 
@@ -120,6 +147,35 @@ class LocationPrivacyValidator:
                 return False
         
         return True
+    
+    @classmethod
+    def validate_location_frequency_batch(cls, driver_id: int, timestamps: List[datetime]) -> List[bool]:
+        """
+        Batch variant of validate_location_frequency - a single DB read per batch.
+        Each timestamp is checked, in order, against the driver's latest stored
+        point and the points already accepted from this batch.
+        Returns: mask of accepted timestamps
+        """
+        if not timestamps:
+            return []
+        
+        last_captured_at = db.session.query(DriverLocation.captured_at).filter_by(
+            driver_id=driver_id
+        ).order_by(DriverLocation.captured_at.desc()).limit(1).scalar()
+        
+        mask = []
+        for captured_at in timestamps:
+            # Stored values are naive; compare wall-clock values on both sides
+            captured_at = captured_at.replace(tzinfo=None)
+            if last_captured_at is not None:
+                time_diff = (captured_at - last_captured_at).total_seconds()
+                if time_diff < cls.MIN_LOCATION_INTERVAL:
+                    mask.append(False)
+                    continue
+            mask.append(True)
+            last_captured_at = captured_at
+        
+        return mask
 
 class DataRetentionManager:
     """Manages data retention policies for location data"""
@@ -1,9 +1,31 @@
 """
 Security utilities for data sanitization and protection
 """
+import os
 import re
 import json
-from typing import Dict, Any, Union, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Union, List, Tuple
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Argon2id for password hashes when argon2-cffi is installed; werkzeug's
+# PBKDF2 otherwise, and for verifying hashes created before the switch.
+# OWASP's minimum profile (19 MiB, 2 passes, 1 lane): a few ms per verify,
+# and hashes with other parameters are upgraded on the next login
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError
+    _argon2 = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+    ARGON2_AVAILABLE = True
+except ImportError:
+    _argon2 = None
+    ARGON2_AVAILABLE = False
+
+# Password verification runs here rather than on the request thread: both
+# hash implementations release the GIL, at most one hash per core runs at a
+# time however many requests are logging in, and under a cooperative worker
+# waiting on the result yields to other requests. Threads start on first use.
+_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='password-hash')
 
 
 class AuditDataSanitizer:
@@ -208,4 +230,33 @@ def get_sanitized_audit_data(audit_log):
         'error_message': sanitizer.sanitize_error_message(audit_log.error_message or ""),
         'masked_ip': sanitizer.mask_ip_address(audit_log.ip_address or ""),
         'masked_session': sanitizer.mask_session_id(audit_log.session_id or "")
-    }
\ No newline at end of file
+    }
+
+def hash_password(password: str) -> str:
+    """Hash a password with the preferred scheme"""
+    if ARGON2_AVAILABLE:
+        return _argon2.hash(password)
+    return generate_password_hash(password)
+
+
+def _verify_password(password_hash: str, password: str) -> Tuple[bool, bool]:
+    if password_hash.startswith('$argon2'):
+        if not ARGON2_AVAILABLE:
+            return False, False
+        try:
+            _argon2.verify(password_hash, password)
+        except (VerificationError, ValueError):
+            return False, False
+        return True, _argon2.check_needs_rehash(password_hash)
+
+    matches = check_password_hash(password_hash, password)
+    return matches, matches and ARGON2_AVAILABLE
+
+
+def verify_password(password_hash: str, password: str) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored hash of any supported scheme.
+    Returns (matches, needs_rehash); needs_rehash is set for matching
+    hashes that are not in the preferred scheme and parameters.
+    """
+    return _hash_pool.submit(_verify_password, password_hash, password).result()
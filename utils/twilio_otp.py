@@ -5,11 +5,14 @@ import os
 import logging
 import hashlib
 import hmac
+from functools import lru_cache
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
+_NON_DIGIT_RE = re.compile(r'\D')
+
 def generate_otp(length: int = 6) -> str:
     """Generate a cryptographically secure OTP code with specified length"""
     return ''.join(secrets.choice(string.digits) for _ in range(length))
@@ -17,7 +20,7 @@ def generate_otp(length: int = 6) -> str:
 def format_phone_number(phone: str) -> str:
     """Format phone number for international use (E.164 format)"""
     # Remove all non-digit characters
-    phone = re.sub(r'\D', '', phone)
+    phone = _NON_DIGIT_RE.sub('', phone)
     
     # Add country code if not present (assuming India +91 for 10-digit numbers)
     if len(phone) == 10:
@@ -29,6 +32,13 @@ def format_phone_number(phone: str) -> str:
     
     return phone
 
+@lru_cache(maxsize=1)
+def get_twilio_client(account_sid: str, auth_token: str):
+    """Twilio client for the given credentials, reused across sends so its
+    HTTP session keeps the TLS connection to the API open"""
+    from twilio.rest import Client
+    return Client(account_sid, auth_token)
+
 def send_otp_sms(phone_number: str, otp_code: str) -> Dict[str, Any]:
     """
     Send OTP via SMS using Twilio integration
@@ -61,10 +71,7 @@ def send_otp_sms(phone_number: str, otp_code: str) -> Dict[str, Any]:
                     'message': 'SMS service not configured. Please contact administrator.'
                 }
         
-        # Import and use Twilio
-        from twilio.rest import Client
-        
-        client = Client(account_sid, auth_token)
+        client = get_twilio_client(account_sid, auth_token)
         
         message_body = f"Your PLS Travels verification code is: {otp_code}. Valid for 10 minutes. Do not share this code."
         
@@ -92,7 +99,7 @@ def send_otp_sms(phone_number: str, otp_code: str) -> Dict[str, Any]:
 def is_valid_phone_number(phone: str) -> bool:
     """Validate phone number format (E.164 compatible)"""
     # Remove all non-digit characters
-    digits_only = re.sub(r'\D', '', phone)
+    digits_only = _NON_DIGIT_RE.sub('', phone)
     
     # Check if it's a valid E.164 format (1-15 digits)
     # For India: 10-digit local or 12-digit with +91
@@ -699,6 +699,85 @@ def calculate_tripsheet(duty_data):
         "company_profit": round(company_profit, 2),
     }
 
+_TRIPSHEET_FIELDS = (
+    'company_pay', 'cash_collected', 'qr_payment', 'outside_cash', 'operator_bill', 'toll',
+    'petrol_expenses', 'gas_expenses', 'other_expenses', 'advance', 'driver_expenses', 'pass_deduction',
+)
+
+# Integers up to this size stay exact through float64 sums
+_TRIPSHEET_MAX_EXACT_INT = 2 ** 50
+
+def _tripsheet_value_is_vectorizable(value):
+    # Exactly int/float: bool, Decimal, numeric strings etc. take the scalar
+    # path so they behave (or fail) as calculate_tripsheet does
+    if type(value) is int:
+        return -_TRIPSHEET_MAX_EXACT_INT <= value <= _TRIPSHEET_MAX_EXACT_INT
+    return type(value) is float and value == value
+
+def calculate_tripsheet_batch(rows):
+    """
+    Vectorized calculate_tripsheet for a list of tripsheet dictionaries.
+
+    Each field is loaded into one NumPy array and the salary/profit formula
+    runs once over the whole batch, in the same operation order as the
+    scalar code. Results are rounded with round() and keep ints where
+    calculate_tripsheet would, so they are identical to calling it per row.
+    Batches with anything other than plain int/float values take the
+    scalar path.
+    """
+    if not rows or not all(
+        isinstance(row, dict) and all(_tripsheet_value_is_vectorizable(row.get(key, 0)) for key in _TRIPSHEET_FIELDS)
+        for row in rows
+    ):
+        return [calculate_tripsheet(row) for row in rows]
+
+    import numpy as np
+
+    count = len(rows)
+    col = {
+        key: np.fromiter((row.get(key, 0) for row in rows), dtype=np.float64, count=count)
+        for key in _TRIPSHEET_FIELDS
+    }
+    # Which results are floats, as calculate_tripsheet's arithmetic would
+    # produce them: a sum is a float when any operand is, and max(d, 0)
+    # yields the int 0 whenever d < 0
+    is_float = {
+        key: np.fromiter((type(row.get(key, 0)) is float for row in rows), dtype=bool, count=count)
+        for key in _TRIPSHEET_FIELDS
+    }
+
+    difference = col['cash_collected'] - col['operator_bill']
+    incentive = np.maximum(difference, 0)
+    driver_salary = col['company_pay'] + incentive - (col['advance'] + col['driver_expenses'] + col['pass_deduction'])
+    earnings = col['cash_collected'] + col['qr_payment'] + col['outside_cash']
+    expenses = col['operator_bill'] + col['toll'] + col['petrol_expenses'] + col['gas_expenses'] + col['other_expenses']
+    company_profit = earnings - (driver_salary + expenses)
+
+    incentive_float = (is_float['cash_collected'] | is_float['operator_bill']) & (difference >= 0)
+    salary_float = (incentive_float | is_float['company_pay'] | is_float['advance']
+                    | is_float['driver_expenses'] | is_float['pass_deduction'])
+    earnings_float = is_float['cash_collected'] | is_float['qr_payment'] | is_float['outside_cash']
+    expenses_float = (is_float['operator_bill'] | is_float['toll'] | is_float['petrol_expenses']
+                      | is_float['gas_expenses'] | is_float['other_expenses'])
+
+    results = {
+        "company_pay": (col['company_pay'], is_float['company_pay']),
+        "incentive": (incentive, incentive_float),
+        "advance": (col['advance'], is_float['advance']),
+        "driver_expenses": (col['driver_expenses'], is_float['driver_expenses']),
+        "pass_deduction": (col['pass_deduction'], is_float['pass_deduction']),
+        "driver_salary": (driver_salary, salary_float),
+        "company_earnings": (earnings, earnings_float),
+        "company_expenses": (expenses, expenses_float),
+        "company_profit": (company_profit, earnings_float | salary_float | expenses_float),
+    }
+    columns = [
+        [round(value, 2) if as_float else int(value) for value, as_float in zip(values.tolist(), floats.tolist())]
+        for values, floats in results.values()
+    ]
+    keys = list(results)
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
 def format_currency(amount):
     """Format amount as Indian currency"""
     return f"₹{amount:,.2f}"
@@ -717,8 +796,7 @@ def get_file_url(filename):
 def ensure_upload_dir():
     """Ensure upload directory exists (for legacy local storage)"""
     upload_dir = 'uploads'
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
+    os.makedirs(upload_dir, exist_ok=True)
     return upload_dir
 
 def upload_to_cloud(file_data, original_filename, bucket_type='assets', content_type=None):
@@ -12,7 +12,7 @@ from sqlalchemy import or_
 from auth import log_audit
 # From twilio_send_message integration
 import os
-from twilio.rest import Client
+from utils.twilio_otp import get_twilio_client
 
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -21,7 +21,7 @@ TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 def send_twilio_message(to_phone_number: str, message: str) -> dict:
     """Send WhatsApp/SMS message via Twilio"""
     try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        client = get_twilio_client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
         
         # Try WhatsApp first, fall back to SMS
         try: